@@ -1,80 +1,288 @@
-"""Defines basic color classes
+"""Defines basic color classes and conversions between color spaces
 """
-import colorsys
 import numpy as np
 
 
-class Color(np.ndarray):
-    """RGB Color"""
+def rgb_to_hsv(rgb):
+    """Converts rgb colors to hsv, works on single colors, lists of colors and whole frames alike
+
+    Args:
+        rgb (np.ndarray): Colors with shape (..., 3) and values from 0 to 255
+
+    Returns:
+        np.ndarray: The hue, saturation and value of the colors with shape (..., 3) and values from 0 to 1
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+
+    saturation = np.divide(delta, maxc, out=np.zeros_like(maxc), where=maxc > 0)
+    # Gray colors have no hue, avoid dividing by zero for them
+    delta = np.where(delta > 0, delta, 1)
+    rc = (maxc - r) / delta
+    gc = (maxc - g) / delta
+    bc = (maxc - b) / delta
+    hue = np.where(
+        r == maxc, bc - gc, np.where(g == maxc, 2 + rc - bc, 4 + gc - rc)
+    )
+    hue = np.where(maxc > minc, (hue / 6) % 1, 0)
+    return np.stack([hue, saturation, maxc], axis=-1)
+
+
+def hsv_to_rgb(hsv):
+    """Converts hsv colors to rgb, works on single colors, lists of colors and whole frames alike
+
+    Args:
+        hsv (np.ndarray): Hue, saturation and value with shape (..., 3) and values from 0 to 1. The hue wraps around.
+
+    Returns:
+        np.ndarray: The rgb colors with shape (..., 3) as uint8
+    """
+    hsv = np.asarray(hsv, dtype=np.float64)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    h = (h % 1) * 6
+    sector = np.floor(h)
+    f = h - sector
+    sector = sector.astype(np.intp) % 6
+
+    p = v * (1 - s)
+    q = v * (1 - s * f)
+    t = v * (1 - s * (1 - f))
+    rgb = np.stack(
+        [
+            np.choose(sector, [v, q, p, p, t, v]),
+            np.choose(sector, [t, v, v, q, p, p]),
+            np.choose(sector, [p, p, t, v, v, q]),
+        ],
+        axis=-1,
+    )
+    return np.clip(rgb * 255, 0, 255).astype(np.uint8)
 
-    def __new__(cls, r, g, b):
-        return np.array([r, g, b], dtype=np.uint8).view(cls)
+
+class HSVCache:
+    """Remembers conversions of single colors between rgb and hsv, for places that convert the same few colors over
+    and over. Hsv colors are quantized before they are looked up.
+    """
+
+    def __init__(self, steps=1024, size=4096):
+        """
+        Args:
+            steps (int, optional): Number of steps hue, saturation and value are quantized to. Defaults to 1024.
+            size (int, optional): Maximum number of cached colors, the cache is emptied when it is full. Defaults to
+            4096.
+        """
+        self.steps = steps
+        self.size = size
+        self.colors = {}
+        self.hsv_colors = {}
+
+    def get(self, h, s, v):
+        """Converts a hsv color to rgb
+
+        Args:
+            h (float): Hue from 0 to 1, wraps around
+            s (float): Saturation from 0 to 1
+            v (float): Value from 0 to 1
+
+        Returns:
+            (int, int, int): The rgb color
+        """
+        steps = self.steps
+        key = (round(h * steps) % steps, round(s * steps), round(v * steps))
+        color = self.colors.get(key)
+        if color is None:
+            if len(self.colors) >= self.size:
+                self.colors.clear()
+            color = tuple(int(c) for c in hsv_to_rgb(np.array(key) / steps))
+            self.colors[key] = color
+        return color
+
+    def get_hsv(self, r, g, b):
+        """Converts a rgb color to hsv
+
+        Args:
+            r (int): Red from 0 to 255
+            g (int): Green from 0 to 255
+            b (int): Blue from 0 to 255
+
+        Returns:
+            (float, float, float): Hue, saturation and value from 0 to 1
+        """
+        key = (int(r), int(g), int(b))
+        hsv = self.hsv_colors.get(key)
+        if hsv is None:
+            if len(self.hsv_colors) >= self.size:
+                self.hsv_colors.clear()
+            hsv = tuple(float(c) for c in rgb_to_hsv(key))
+            self.hsv_colors[key] = hsv
+        return hsv
+
+
+HSV_CACHE = HSVCache()
+
+
+def _clamp(value):
+    value = int(value)
+    if value < 0:
+        return 0
+    if value > 255:
+        return 255
+    return value
+
+
+_OPERATIONS = {
+    np.add: lambda a, b: a + b,
+    np.subtract: lambda a, b: a - b,
+    np.multiply: lambda a, b: a * b,
+    np.true_divide: lambda a, b: a / b,
+}
+
+
+class Color:
+    """RGB Color
+
+    The channels are stored as a tuple of ints, so colors are cheap to create and to hand to numpy. Arithmetic works
+    with numbers, other colors and any sequence of three values and saturates at 0 and 255.
+    """
+
+    __slots__ = ("rgb",)
+
+    def __init__(self, r, g, b):
+        self.rgb = (_clamp(r), _clamp(g), _clamp(b))
 
     @classmethod
-    def from_hsv(cls, h: float, s: float, v: float):
+    def from_hsv(cls, h: float, s: float, v: float, cached: bool = False):
         """
         Creates a color from floating-point hsv values
         Args:
             h: hue
             s: saturation
             v: value
+            cached: Whether to look the color up in the quantized HSV_CACHE instead of converting it exactly, for
+            colors that are converted every frame. Defaults to False.
 
         Returns:
             A RGB color corresponding to the specifed hsv values
         """
-        return cls(*map(lambda x: int(x * 255), colorsys.hsv_to_rgb(h, s, v)))
+        if cached:
+            return cls(*HSV_CACHE.get(h, s, v))
+        return cls(*hsv_to_rgb((h, s, v)))
 
     def to_hsv(self):
-        return colorsys.rgb_to_hsv(self.r, self.g, self.b)
+        """Returns the hue, saturation and value of the color from 0 to 1"""
+        return HSV_CACHE.get_hsv(*self.rgb)
 
     @staticmethod
     def _convert(color):
-        return max(0, min(255, int(color)))
+        return _clamp(color)
+
+    def __getitem__(self, index):
+        return self.rgb[index]
 
     def __setitem__(self, index, value):
-        return super().__setitem__(index, self._convert(value))
+        rgb = list(self.rgb)
+        rgb[index] = _clamp(value)
+        self.rgb = tuple(rgb)
+
+    def __iter__(self):
+        return iter(self.rgb)
+
+    def __len__(self):
+        return 3
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.rgb, dtype=np.uint8 if dtype is None else dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        # Numpy scalars and vectors would otherwise turn the color into a plain array that doesn't saturate
+        operation = _OPERATIONS.get(ufunc)
+        if operation is not None and method == "__call__" and len(inputs) == 2 and not kwargs:
+            if inputs[0] is self:
+                result = self._apply(inputs[1], operation)
+            else:
+                result = self._apply(inputs[0], lambda a, b: operation(b, a))
+            if result is not NotImplemented:
+                return result
+        # Arrays of colors are left to numpy
+        inputs = [np.asarray(x) if isinstance(x, Color) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __eq__(self, other):
+        try:
+            return self.rgb == tuple(other)
+        except TypeError:
+            return NotImplemented
+
+    # Colors can be changed in place, so like the old ndarray based Color they can't be hashed
+    __hash__ = None
 
     def __repr__(self):
-        return f"Color({self.r}, {self.g}, {self.b})"
+        return f"Color({self.rgb[0]}, {self.rgb[1]}, {self.rgb[2]})"
+
+    def _apply(self, other, operation):
+        r, g, b = self.rgb
+        if isinstance(other, np.number):
+            # Small numpy integers would overflow before the result is saturated
+            other = other.item()
+        if isinstance(other, (int, float)):
+            return Color(operation(r, other), operation(g, other), operation(b, other))
+        if isinstance(other, np.ndarray) and other.ndim > 0 and other.shape != (3,):
+            # Leave arrays of colors to numpy
+            return NotImplemented
+        r2, g2, b2 = other
+        return Color(operation(r, r2), operation(g, g2), operation(b, b2))
 
     def __add__(self, other):
-        return Color(*map(self._convert, super().__add__(other)))
+        return self._apply(other, lambda a, b: a + b)
+
+    def __radd__(self, other):
+        return self._apply(other, lambda a, b: b + a)
 
     def __sub__(self, other):
-        return Color(*map(self._convert, super().__sub__(other)))
+        return self._apply(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._apply(other, lambda a, b: b - a)
 
     def __mul__(self, other):
-        return Color(*map(self._convert, super().__mul__(other)))
+        if isinstance(other, (int, float)):
+            r, g, b = self.rgb
+            return Color(r * other, g * other, b * other)
+        return self._apply(other, lambda a, b: a * b)
+
+    __rmul__ = __mul__
 
-    def __div__(self, other):
-        return Color(*map(self._convert, super() / other))
+    def __truediv__(self, other):
+        return self._apply(other, lambda a, b: a / b)
 
     @property
     def r(self):
         """The amount of red in the color"""
-        return self[0]
+        return self.rgb[0]
 
     @property
     def g(self):
         """The amount of green in the color"""
-        return self[1]
+        return self.rgb[1]
 
     @property
     def b(self):
         """The amount of blue in the color"""
-        return self[2]
+        return self.rgb[2]
 
     @r.setter
     def r(self, value):
-        self[0] = self._convert(value)
+        self[0] = value
 
     @g.setter
     def g(self, value):
-        self[1] = self._convert(value)
+        self[1] = value
 
     @b.setter
     def b(self, value):
-        self[2] = self._convert(value)
+        self[2] = value
 
 
 def blend(color1: Color, color2: Color, progression: float):
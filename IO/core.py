@@ -4,6 +4,7 @@ import time
 import numpy as np
 from IO.effects import (
     EffectCombination,
+    EffectPipeline,
     VerticalDistort,
     StripedNoise,
     Dropout,
@@ -16,10 +17,18 @@ from IO.effects import (
     Minimize,
 )
 from IO.color import Color
+from IO.framebuffer import FrameBuffer
+from IO.scheduler import FrameScheduler, FrameRateGovernor
+from IO.profiling import FrameProfiler
+from IO.recording import VideoRecorder
+from IO.session import SessionRecorder
 import cv2
 import json
 import os
 
+# Where the IOManager and the applications store their data, benchmarks point it somewhere else
+APPDATA = os.path.join("resources", "appdata")
+
 
 class ControllerValue:
     """The value of a controller"""
@@ -29,18 +38,23 @@ class ControllerValue:
         self.fresh = False
         self.last_change = time.time()
         self.dtype = dtype
+        self.on_change = None
 
-    def update(self, value):
+    def update(self, value, timestamp=None):
         """Assigns a new value to the button/input
 
         Args:
             value (self.dtype): The new value that is assigned to that button
+            timestamp (float, optional): The time.time() the input happened at, if it is applied later, e.g. after
+            arriving over the network. Defaults to now.
         """
         new_value = self.dtype(value)
         if new_value != self._value:
             self._value = new_value
             self.fresh = True
-            self.last_change = time.time()
+            self.last_change = time.time() if timestamp is None else timestamp
+            if self.on_change is not None:
+                self.on_change()
 
     def get_value(self):
         """Gets the current value of the button/input
@@ -111,6 +125,16 @@ class Controller:
         self.button_menu = BooleanControllerValue()
         self.button_teppich = BooleanControllerValue()
 
+    def get_values(self):
+        """Returns all controller values of this controller"""
+        return [
+            value for value in vars(self).values() if isinstance(value, ControllerValue)
+        ]
+
+    def get_state(self):
+        """Returns the current state of all controller values, without marking them as read"""
+        return tuple(value._value for value in self.get_values())
+
 
 class Display:
     """The Base class for a display, showing the current state of the application"""
@@ -118,13 +142,38 @@ class Display:
     def __init__(self, width, height, brightness=1):
         self.width = width
         self.height = height
-        self.pixels = np.zeros((width, height, 3), dtype=np.uint8)
-        self.last_pixels = np.ones((width, height, 3), dtype=np.uint8)
+        self.framebuffer = FrameBuffer(width, height)
         self.brightness = brightness
+        self.changed = True
+
+    @property
+    def pixels(self):
+        """The frame that is being drawn with shape (width, height, 3). Writes to it are tracked, so only the region
+        that was drawn to has to be compared with the last frame. This is a different array after every refresh, so
+        don't keep a reference to it across frames.
+        """
+        return self.framebuffer.back
+
+    @pixels.setter
+    def pixels(self, value):
+        self.framebuffer.write_frame(value)
+
+    @property
+    def last_pixels(self):
+        """The frame that is currently shown"""
+        return self.framebuffer.front
+
+    def write_frame(self, frame):
+        """Copies a whole frame onto the screen, without allocating a new buffer
+
+        Args:
+            frame (np.ndarray): The frame with shape (width, height, 3)
+        """
+        self.framebuffer.write_frame(frame)
 
     def force_update(self):
         """Forces all pixels to be redrawn, even if they might have not changed"""
-        self.last_pixels = np.ones((self.width, self.height, 3), dtype=np.uint8)
+        self.framebuffer.force()
 
     def check_coordinates(self, x, y):
         """Checks wether the given coordinates are valid
@@ -167,7 +216,7 @@ class Display:
         self.check_coordinates(x, y)
         if not isinstance(color, Color):
             color = Color(*color)
-        self.pixels[x][y] = color
+        self.framebuffer.set(x, y, color.rgb)
 
     def fill(self, color):
         """Fills the entire screen with one color
@@ -177,13 +226,26 @@ class Display:
         """
         if not isinstance(color, Color):
             color = Color(*color)
-        color = tuple(color)
+        self.framebuffer.fill(color.rgb)
 
-        self.pixels = np.ones((self.width, self.height, 3), dtype=np.uint8) * color
+    def clear(self):
+        """Turns all pixels off"""
+        self.framebuffer.clear()
 
     def _update(self, x, y, color):
         raise NotImplementedError("Please implement this method!")
 
+    def _update_frame(self, indices, colors):
+        """Updates all changed pixels at once. Backends that can push a whole frame in one go should override this,
+        by default every pixel is passed on to `_update` individually.
+
+        Args:
+            indices ((np.ndarray, np.ndarray)): The x and y coordinates of the changed pixels
+            colors (np.ndarray): The new rgb colors of those pixels with shape (n, 3), not yet scaled by brightness
+        """
+        for x, y, color in zip(*indices, colors):
+            self._update(x, y, color * self.brightness)
+
     def _refresh(self):
         pass
 
@@ -191,18 +253,25 @@ class Display:
         """Shows changes on the screen. Only updated pixels that have been changed
         since last call to this function.
         """
-        # Only update pixels that have changed
-        for x, y in zip(*np.where(np.any(self.pixels != self.last_pixels, axis=2))):
-            self._update(x, y, self.pixels[x][y] * self.brightness)
-        self.last_pixels = self.pixels.copy()
+        changes = self.framebuffer.get_changes()
+        self.changed = changes is not None
+        if self.changed:
+            self._update_frame(*changes)
+        self.framebuffer.present()
         self._refresh()
 
     def show_img(self, path):
-        off_img = cv2.imread(path)
-        for x in range(10):
-            for y in range(15):
-                b, g, r = off_img[y][x]
-                self.update(x, y, (r, g, b))
+        """Shows an image, scaled to the size of the display if needed
+
+        Args:
+            path (str): Path of the image
+        """
+        img = cv2.imread(path)
+        if img.shape[:2] != (self.height, self.width):
+            img = cv2.resize(
+                img, (self.width, self.height), interpolation=cv2.INTER_NEAREST
+            )
+        self.write_frame(img[:, :, ::-1].transpose(1, 0, 2))
         self.refresh()
 
     def off(self):
@@ -224,7 +293,13 @@ class IOManager:
         animation_duration=0.25,
         record_path=None,
         record_scale=10,
+        record_queue_size=64,
+        record_policy=VideoRecorder.DROP,
+        session_path=None,
         expected_battery_life=60,
+        overrun_policy=FrameScheduler.SKIP,
+        min_fps=5,
+        profile=True,
     ):
         self.running_uncharged = self.load_running_uncharged()
         self.expected_battery_life = expected_battery_life
@@ -234,11 +309,15 @@ class IOManager:
         self.running = True
         self.applications = None
         self.fps = fps
-        self.last_frame = display.pixels
+        self.scheduler = FrameScheduler(policy=overrun_policy)
+        self.governor = FrameRateGovernor(min_fps=min_fps)
+        self.last_input = controller.get_state()
+        self.profiler = FrameProfiler(enabled=profile)
         self.last_update = time.time()
         self.animation_duration = animation_duration
         self.current_animation = None
         self.color_palette = None
+        self.effects = EffectPipeline()
 
         self.teppich = 0
         self.teppich_animations = [
@@ -259,24 +338,28 @@ class IOManager:
 
         # Start recording if necessary
         self.video_out = None
-        if record_path is not None:
-            self.record_shape = (
-                display.width * record_scale,
-                display.height * record_scale,
+        if record_path is not None and VideoRecorder.supports(record_path):
+            self.video_out = VideoRecorder(
+                record_path,
+                fps,
+                scale=record_scale,
+                queue_size=record_queue_size,
+                policy=record_policy,
             )
-            if record_path.lower().endswith(".avi"):
-                self.video_out = cv2.VideoWriter(
-                    record_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, self.record_shape
-                )
-            elif record_path.lower().endswith(".mp4"):
-                self.video_out = cv2.VideoWriter(
-                    record_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, self.record_shape
-                )
+
+        self.session = None
+        if session_path is not None:
+            self.session = SessionRecorder(session_path, display.width, display.height)
+
+        # Input wakes up the main loop right away, even if it is running at a low frame rate
+        for value in controller.get_values():
+            value.on_change = self.wake_up
 
     @staticmethod
     def load_running_uncharged():
-        if os.path.exists("resources/appdata/Core.json"):
-            with open("resources/appdata/Core.json") as f:
+        path = os.path.join(APPDATA, "Core.json")
+        if os.path.exists(path):
+            with open(path) as f:
                 return json.load(f).get("running_uncharged", 0)
         return 0
 
@@ -295,16 +378,20 @@ class IOManager:
             application ([type]): [description]
         """
         self.applications = [application]
-        last = time.time()
-        mfps = self.fps
+        fps = self.fps
+        self.scheduler.start()
         while len(self.applications) > 0:
-            now = time.time()
-            delta = now - last
-            last = now
+            delta = self.scheduler.begin_frame()
+            self.profiler.begin_frame(self.applications[-1].name)
             self.update()
+            if not self.running:
+                break
+            self.scheduler.cancel_wake()
+            self.profiler.lap("input")
 
             if not self.applications[-1].is_sleeping(delta):
                 self.applications[-1].update(self, delta)
+                self.profiler.lap("update")
 
                 if self.applications[-1].MAX_FPS is not None:
                     fps = min(self.fps, self.applications[-1].MAX_FPS)
@@ -315,49 +402,59 @@ class IOManager:
             if self.controller.button_menu.fresh_press():
                 self.close_application()
 
-            # Apply Effects
+            # Transition between applications
             if self.current_animation is not None:
                 if self.current_animation.is_finished():
                     self.current_animation = None
                 else:
-                    self.current_animation.apply(self.display)
                     fps = self.fps
 
                     # Wake application up
                     self.applications[-1].wakers = None
 
-            # Apply Drunkguard
+            # Drunkguard
             if self.controller.button_teppich.fresh_press():
                 self.teppich = (self.teppich + 1) % len(self.teppich_animations)
 
-            if self.teppich_animations[self.teppich] is not None:
-                self.teppich_animations[self.teppich].apply(self.display)
+            animations = [self.current_animation, self.teppich_animations[self.teppich]]
+            if not self.effects.is_noop(animations):
                 fps = self.fps
 
-            # Apply Color Palette
-            if self.color_palette is not None:
-                self.color_palette.apply(self.display)
+            # Apply transition, drunkguard and color palette in one go
+            if self.effects.run(self.display, animations + [self.color_palette]):
+                self.profiler.lap("effects")
 
             # Update display
             self.display.refresh()
+            self.profiler.lap("refresh")
+
+            # Save frame and input to the session log
+            if self.session is not None:
+                self.session.write_inputs(self.controller, self.scheduler.frame_time)
+                self.session.write_frame(self.display.pixels, self.scheduler.frame_time)
+                self.profiler.lap("session")
 
             # Save frame to recording
             if self.video_out is not None:
-                out = cv2.resize(
-                    self.display.pixels.transpose(1, 0, 2),
-                    self.record_shape,
-                    interpolation=cv2.INTER_NEAREST,
-                )
-                self.video_out.write(cv2.cvtColor(out, cv2.COLOR_RGB2BGR))
+                self.video_out.write(self.display.pixels, self.scheduler.frame_time)
+                self.profiler.lap("record")
+
+            self.profiler.end_frame()
 
-            # Sleep for the rest of the frame
-            calc_duration = time.time() - last
-            # mfps = (10 * mfps + 1 / calc_duration) / 11
-            # print("max FPS", int(mfps), "\tFPS", int(fps))
+            # Lower the frame rate while nothing is happening
+            input_state = self.controller.get_state()
+            active = (
+                self.display.changed
+                or input_state != self.last_input
+                or not self.effects.is_noop(animations)
+            )
+            self.last_input = input_state
+            fps = self.governor.get_fps(fps, delta, active)
 
-            time.sleep(max(0, 1 / fps - calc_duration))
+            # Sleep until the next frame is due
+            self.scheduler.end_frame(fps)
 
-            self.running_uncharged += calc_duration + max(0, 1 / fps - calc_duration)
+            self.running_uncharged += delta
 
     def __enter__(self):
         self.display.start()
@@ -366,14 +463,16 @@ class IOManager:
     def __exit__(self, *args, **kwargs):
         self.display.off()
 
-        with open("resources/appdata/Core.json", "w+") as f:
+        with open(os.path.join(APPDATA, "Core.json"), "w+") as f:
             json.dump({"running_uncharged": self.running_uncharged}, f)
 
         self.running = False
-        while len(self.applications) > 0:
+        # Nothing was run if the manager only provided its display
+        while self.applications:
             self.applications[-1].destroy()
             self.applications = self.applications[:-1]
 
+        self.stop_recording()
         self.destroy()
 
     def open_application(self, application):
@@ -382,26 +481,50 @@ class IOManager:
         Args:
             application (application.core.Application): The application to be opened
         """
-        self.current_animation = SlideDown(self.display, self.animation_duration)
+        self.current_animation = SlideDown(
+            self.display, self.animation_duration, clock=self.scheduler.clock
+        )
         self.applications.append(application)
 
     def close_application(self):
         """Closes the topmost application and returns to the previously opened appplication.
         If none exists quits the Program
         """
+        if self.applications is None:
+            return
         if len(self.applications) > 1:
-            self.current_animation = Minimize(self.display, self.animation_duration)
+            self.current_animation = Minimize(
+                self.display, self.animation_duration, clock=self.scheduler.clock
+            )
             self.applications = self.applications[:-1]
         if len(self.applications) == 0:
             self.running = False
 
+    def wake_up(self):
+        """Starts the next frame right away instead of waiting for its deadline"""
+        self.scheduler.wake()
+
+    def dump_profile(self):
+        """Writes the timing stats of all frame stages and the time spent at each frame rate to the appdata"""
+        self.profiler.dump(
+            os.path.join(APPDATA, "Profile.json"),
+            extra={"frame_rates": self.governor.get_report()},
+        )
+
     def update(self):
         """Update function that gets called every frame"""
 
-    def destroy(self):
-        """Cleanup function that gets called after all applications are closed"""
+    def stop_recording(self):
+        """Writes the remaining queued frames and closes the recording and the session log, if there are any"""
         if self.video_out is not None:
             self.video_out.release()
+            self.video_out = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def destroy(self):
+        """Cleanup function that gets called after all applications are closed"""
 
     def get_battery(self):
         """Calculates the current battery, returns value between 0 (empty) and 1 (fully charged)"""
@@ -0,0 +1,65 @@
+"""Color correction for the LED output, precomputed into lookup tables
+"""
+import numpy as np
+
+
+class ColorCorrection:
+    """Maps rgb values of the frame to the values that are sent to the LEDs. Gamma, brightness, the minimum-on threshold
+    and the white balance are baked into one lookup table per channel, so correcting a frame is a single table lookup.
+    The tables are only rebuilt when one of the settings changes.
+    """
+
+    # Offsets of the red, green and blue tables within the flattened lookup table
+    OFFSETS = np.array([0, 256, 512], dtype=np.intp)
+
+    def __init__(self, gamma=2, brightness=1, minimum=1, white_balance=(1, 1, 1)):
+        """
+        Args:
+            gamma (float, optional): Exponent applied to the normalized channel values. Defaults to 2.
+            brightness (float, optional): Factor between 0 and 1 applied before the gamma curve. Defaults to 1.
+            minimum (int, optional): Smallest output value of a channel that is on, so dark colors don't just turn
+            off. Defaults to 1.
+            white_balance ((float, float, float), optional): Factor per channel to calibrate the white point of the
+            LEDs. Defaults to (1, 1, 1).
+        """
+        self.gamma = gamma
+        self.brightness = brightness
+        self.minimum = minimum
+        self.white_balance = tuple(white_balance)
+        self.table = None
+        self.build()
+
+    def build(self):
+        """Rebuilds the lookup table from the current settings"""
+        scaled = np.floor(np.arange(256) * self.brightness)
+        balance = np.array(self.white_balance, dtype=np.float64).reshape(3, 1)
+
+        corrected = np.floor(255 * (scaled / 255) ** self.gamma * balance)
+        on = (scaled > 0) & (balance > 0)
+        corrected = np.where(on, np.maximum(corrected, self.minimum), corrected)
+
+        self.table = np.clip(corrected, 0, 255).astype(np.uint8).reshape(-1)
+
+    def set_brightness(self, brightness):
+        """Changes the brightness, only rebuilds the lookup table if it actually changed"""
+        if brightness != self.brightness:
+            self.brightness = brightness
+            self.build()
+
+    def set_white_balance(self, white_balance):
+        """Changes the white balance, only rebuilds the lookup table if it actually changed"""
+        white_balance = tuple(white_balance)
+        if white_balance != self.white_balance:
+            self.white_balance = white_balance
+            self.build()
+
+    def apply(self, colors):
+        """Corrects an array of colors
+
+        Args:
+            colors (np.ndarray): Integer rgb values in the last dimension, e.g. with shape (n, 3) or (w, h, 3)
+
+        Returns:
+            np.ndarray: The corrected colors with the same shape and dtype uint8
+        """
+        return np.take(self.table, colors.astype(np.intp) + self.OFFSETS)
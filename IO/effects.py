@@ -3,137 +3,281 @@
 import time
 import numpy as np
 import cv2
-import math
 
 
 class WindowEffect:
     """An Effect that can be applied on the entire display, regardless of the current application"""
 
-    def __init__(self, display=None, duration=None):
+    def __init__(self, display=None, duration=None, clock=time.time):
+        """
+        Args:
+            display (IO.core.Display, optional): The display, whose current frame is kept as the start frame
+            duration (float, optional): How long the effect lasts in seconds. Defaults to None, which never ends.
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.time.
+        """
         if display is not None:
-            self.start_pixels = display.pixels
+            self.start_pixels = np.array(display.pixels)
 
+        self.clock = clock
         self.duration = duration
         if duration is not None:
-            self.start_time = time.time()
+            self.start_time = clock()
 
     def is_finished(self):
         """Checks whether the effect has finished"""
         if self.duration is None:
             return False
-        return time.time() >= self.start_time + self.duration
+        return self.clock() >= self.start_time + self.duration
+
+    def is_noop(self):
+        """Checks whether the effect would leave the frame unchanged, so it can be skipped"""
+        return False
+
+    def process(self, frame):
+        """
+        Applies the effect in place to a frame
+        Args:
+            frame: A float32 frame with shape (width, height, 3). Values may leave the range from 0 to 255, they are
+                clamped once after all effects have been applied.
+        """
+        raise NotImplementedError("Please Implement this method")
 
     def apply(self, display):
         """
-        Applies the effect to the current display
+        Applies only this effect to the current display, use an EffectPipeline to apply several at once
         Args:
             display: The current state of the display
         """
-        raise NotImplementedError("Please Implement this method")
+        _pipeline.run(display, [self])
 
 
-class EffectCombination:
+class EffectCombination(WindowEffect):
     """A combination of multiple effects"""
 
     def __init__(self, effects):
+        super().__init__()
         self.effects = effects
 
     def is_finished(self):
         """Checks whether the effects have finished"""
-        return all([a.is_finished for a in self.effects])
+        return all([a.is_finished() for a in self.effects])
 
-    def apply(self, display):
+    def is_noop(self):
+        """Checks whether all of the effects would leave the frame unchanged"""
+        return all([a.is_noop() for a in self.effects])
+
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effects in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
         for a in self.effects:
-            a.apply(display)
+            a.process(frame)
 
 
-class SlideDown(WindowEffect):
-    """Slides the initial screen down and reveals the current screen"""
+class EffectPipeline:
+    """Applies a chain of effects to the display with a single preallocated float32 working buffer. The frame is
+    converted once, every effect changes the buffer in place and the result is clamped and converted back once, so
+    stacking effects costs little more than a single one.
+    """
+
+    def __init__(self):
+        self.buffer = None
+
+    @staticmethod
+    def is_noop(effects):
+        """Checks whether a chain of effects would leave the frame unchanged
 
-    def apply(self, display):
-        """
-        Applies the effect to the current display
         Args:
-            display: The current state of the display
+            effects (list): The effects, None entries are ignored
         """
-        progression = (time.time() - self.start_time) / self.duration
-        if progression > 1:
-            return
+        return all(effect is None or effect.is_noop() for effect in effects)
 
-        height = max(1, int(display.pixels.shape[1] * progression))
+    def run(self, display, effects):
+        """Applies a chain of effects to the display
 
-        display.pixels[:, :height] = display.pixels[:, -height:]
-        display.pixels[:, height:] = self.start_pixels[:, height:]
+        Args:
+            display (IO.core.Display): The display
+            effects (list): The effects in the order they should be applied, None entries are ignored
 
+        Returns:
+            bool: Whether any effect was applied
+        """
+        effects = [effect for effect in effects if effect is not None and not effect.is_noop()]
+        if len(effects) == 0:
+            return False
 
-class SlideUp(WindowEffect):
-    """Slides the initial screen up and reveals the current screen"""
+        self.buffer = get_buffer(self.buffer, display)
+        np.copyto(self.buffer, display.pixels)
+        for effect in effects:
+            effect.process(self.buffer)
+        np.clip(self.buffer, 0, 255, out=self.buffer)
+        display.write_frame(self.buffer)
+        return True
+
+
+def get_buffer(buffer, display):
+    """Returns a float buffer with the shape of the display, reusing the given one if it still fits"""
+    if buffer is None or buffer.shape[:2] != (display.width, display.height):
+        buffer = np.zeros((display.width, display.height, 3), dtype=np.float32)
+    return buffer
+
+
+def reflect(values, limit):
+    """Folds values back into [-limit, limit], as if they had bounced off the limits
+
+    Args:
+        values (np.ndarray): The values, changed in place
+        limit (float): The absolute limit
+
+    Returns:
+        np.ndarray: The folded values
+    """
+    period = 4 * limit
+    np.add(values, limit, out=values)
+    np.mod(values, period, out=values)
+    # Values in the upper half of a period are on their way back down
+    np.subtract(period, values, out=values, where=values > 2 * limit)
+    np.subtract(values, limit, out=values)
+    return values
+
+
+class Transition(WindowEffect):
+    """A transition from the start frame to the current frame. Its geometry only depends on the progression, so the
+    copies for a geometry, including resized versions of the start frame, are planned once and then reused by every
+    frame with the same geometry. Plans are made the first time a geometry is needed, because a short transition only
+    shows a few of them, `precompute` plans all of them up front.
+    """
+
+    def __init__(self, display=None, *args, **kwargs):
+        super().__init__(display, *args, **kwargs)
+        self.plans = {}
+        if display is not None:
+            self.start_static = self.start_pixels.astype(np.float32)
 
-    def apply(self, display):
+    def precompute(self, width, height):
+        """Plans every geometry the transition goes through, so no frame has to plan anything
+
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
         """
-        Applies the effect to the current display
+        for key in self.get_keys(width, height):
+            if key not in self.plans:
+                self.plans[key] = self.build(key, width, height)
+
+    def get_key(self, progression, width, height):
+        """Returns a hashable description of the geometry at a point of the transition
+
         Args:
-            display: The current state of the display
+            progression (float): How far the transition is, from 0 to 1
+            width (int): Width of the display
+            height (int): Height of the display
         """
-        progression = (time.time() - self.start_time) / self.duration
-        if progression > 1:
-            return
+        raise NotImplementedError("Please Implement this method")
 
-        height = max(1, int(display.pixels.shape[1] * (1 - progression)))
+    def build(self, key, width, height):
+        """Plans the copies for a geometry
 
-        display.pixels[:, :height] = self.start_pixels[:, -height:]
-        display.pixels[:, height:] = display.pixels[:, height:]
+        Args:
+            key: The geometry as returned by `get_key`
+            width (int): Width of the display
+            height (int): Height of the display
 
+        Returns:
+            list: (target, source, region) tuples, `frame[target] = source[region]` is executed for each of them.
+            A source of None stands for the current frame itself.
+        """
+        raise NotImplementedError("Please Implement this method")
 
-class Squeeze(WindowEffect):
-    """Squeezes the initial screen horizontally and reveals the current screen"""
+    def get_keys(self, width, height):
+        """Lists all geometries the transition goes through. The geometry changes at most at multiples of one pixel of
+        either dimension, so it is enough to look at these points and in between them.
+        """
+        points = sorted(
+            {k / width for k in range(width + 1)} | {k / height for k in range(height + 1)}
+        )
+        points += [(a + b) / 2 for a, b in zip(points, points[1:])]
+        return {self.get_key(progression, width, height) for progression in points}
 
-    def apply(self, display):
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        progression = (time.time() - self.start_time) / self.duration
+        progression = (self.clock() - self.start_time) / self.duration
         if progression > 1:
             return
 
-        height = max(1, int(display.pixels.shape[1] * (1 - progression)))
+        width, height = frame.shape[:2]
+        key = self.get_key(progression, width, height)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = self.plans[key] = self.build(key, width, height)
+
+        for target, source, region in plan:
+            frame[target] = (frame if source is None else source)[region]
+
 
-        squeezed = cv2.resize(self.start_pixels, (height, display.pixels.shape[0]))
-        top = (display.pixels.shape[1] - height) // 2
+class SlideDown(Transition):
+    """Slides the initial screen down and reveals the current screen"""
+
+    def get_key(self, progression, width, height):
+        return max(1, int(height * progression))
+
+    def build(self, key, width, height):
+        return [
+            (np.s_[:, :key], None, np.s_[:, height - key :]),
+            (np.s_[:, key:], self.start_static, np.s_[:, key:]),
+        ]
+
+
+class SlideUp(Transition):
+    """Slides the initial screen up and reveals the current screen"""
+
+    def get_key(self, progression, width, height):
+        return max(1, int(height * (1 - progression)))
 
-        display.pixels[:, top : top + height] = squeezed
+    def build(self, key, width, height):
+        return [(np.s_[:, :key], self.start_static, np.s_[:, height - key :])]
 
 
-class Minimize(WindowEffect):
+class Squeeze(Transition):
     """Squeezes the initial screen horizontally and reveals the current screen"""
 
-    def apply(self, display):
-        """
-        Applies the effect to the current display
-        Args:
-            display: The current state of the display
-        """
-        progression = (time.time() - self.start_time) / self.duration
-        if progression > 1:
-            return
+    def get_key(self, progression, width, height):
+        return max(1, int(height * (1 - progression)))
 
-        height = max(1, int(display.pixels.shape[1] * (1 - progression)))
-        width = max(1, int(display.pixels.shape[0] * (1 - progression)))
+    def build(self, key, width, height):
+        squeezed = cv2.resize(self.start_pixels, (key, width)).astype(np.float32)
+        top = (height - key) // 2
+        return [(np.s_[:, top : top + key], squeezed, Ellipsis)]
 
-        squeezed = cv2.resize(self.start_pixels, (height, width))
 
-        left = (display.pixels.shape[0] - width) // 2
+class Minimize(Transition):
+    """Squeezes the initial screen horizontally and reveals the current screen"""
 
-        display.pixels[
-            left : left + width, display.pixels.shape[1] - height :
-        ] = squeezed
+    def get_key(self, progression, width, height):
+        return (
+            max(1, int(height * (1 - progression))),
+            max(1, int(width * (1 - progression))),
+        )
+
+    def build(self, key, width, height):
+        squeezed_height, squeezed_width = key
+        squeezed = cv2.resize(
+            self.start_pixels, (squeezed_height, squeezed_width)
+        ).astype(np.float32)
+        left = (width - squeezed_width) // 2
+        return [
+            (
+                np.s_[left : left + squeezed_width, height - squeezed_height :],
+                squeezed,
+                Ellipsis,
+            )
+        ]
 
 
 class Noise(WindowEffect):
@@ -143,20 +287,19 @@ class Noise(WindowEffect):
         super().__init__(*args, **kwargs)
         self.level = level
 
-    def apply(self, display):
+    def is_noop(self):
+        return self.level == 0
+
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        noise = (np.random.random((10, 15)) - 0.5) * 2 * self.level
-        noisy = display.pixels.astype(np.float32)
-        noisy[:, :, 0] += noise
-        noisy[:, :, 1] += noise
-        noisy[:, :, 2] += noise
-        noisy[np.where(noisy > 255)] = 255
-        noisy[np.where(noisy < 0)] = 0
-        display.pixels = noisy.astype(np.uint8)
+        noise = np.random.random((frame.shape[0], frame.shape[1], 1))
+        noise -= 0.5
+        noise *= 2 * self.level
+        frame += noise
 
 
 class StripedNoise(WindowEffect):
@@ -168,25 +311,27 @@ class StripedNoise(WindowEffect):
         self.limit = limit
         self.noise = 0
 
-    def apply(self, display):
+    def is_noop(self):
+        return self.limit == 0
+
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        img = display.pixels.astype(np.float)
-        for y in range(display.height):
-            for x in range(display.width):
-                self.noise += (np.random.random() - 0.5) * 2 / self.coarseness
-                if self.noise > self.limit:
-                    self.noise = 2 * self.limit - self.noise
-                if self.noise < -self.limit:
-                    self.noise = -2 * self.limit - self.noise
-                img[x, y] += self.noise
+        width, height = frame.shape[:2]
+        # A random walk over all pixels row by row, that bounces off the limits. A folded free random walk has the
+        # same distribution as one that is reflected step by step, because the steps are symmetric.
+        steps = np.random.random(width * height)
+        steps -= 0.5
+        steps *= 2 / self.coarseness
+        walk = np.cumsum(steps, out=steps)
+        walk += self.noise
+        reflect(walk, self.limit)
+        self.noise = walk[-1]
 
-        img[np.where(img > 255)] = 255
-        img[np.where(img < 0)] = 0
-        display.pixels = img.astype(np.uint8)
+        frame += walk.reshape(height, width, 1).transpose(1, 0, 2)
 
 
 class VerticalDistort(WindowEffect):
@@ -196,25 +341,34 @@ class VerticalDistort(WindowEffect):
         super().__init__(*args, **kwargs)
         self.amount = amount
         self.frequency = frequency
+        self.columns = None
 
-    def apply(self, display):
+    def is_noop(self):
+        return self.amount == 0 or self.frequency == 0
+
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        amount = 0
-        for y in range(display.height):
-            rand = np.random.random()
-            if rand < self.frequency:
-                amount += int((np.random.random() - 0.5) * 2 * self.amount)
+        width, height = frame.shape[:2]
+        # The offset changes at random rows and stays until the next change
+        rand = np.random.random((2, height))
+        jumps = ((rand[1] - 0.5) * 2 * self.amount).astype(np.intp)
+        jumps[rand[0] >= self.frequency] = 0
+        offsets = np.cumsum(jumps)
+        if not offsets.any():
+            return
+
+        if self.columns is None or len(self.columns) != width:
+            self.columns = np.arange(width).reshape(-1, 1)
+        # Every row is shifted by its offset, pixels that are shifted in keep their old color
+        sources = self.columns - offsets
+        outside = (sources < 0) | (sources >= width)
+        np.copyto(sources, self.columns, where=outside)
 
-            if amount > 0:
-                display.pixels[amount:, y] = display.pixels[:-amount, y]
-                # display.pixels[:amount, y] = 0
-            elif amount < 0:
-                display.pixels[:amount, y] = display.pixels[-amount:, y]
-                # display.pixels[-amount:, y] = 0
+        frame[...] = frame[sources, np.arange(height)]
 
 
 class Dropout(WindowEffect):
@@ -224,83 +378,108 @@ class Dropout(WindowEffect):
         super().__init__(*args, **kwargs)
         self.frequency = frequency
 
-    def apply(self, display):
+    def is_noop(self):
+        return self.frequency == 0
+
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        for y in range(display.height):
-            rand = np.random.random()
-            if rand < self.frequency:
-                display.pixels[:, y] = 0
+        rows = np.random.random(frame.shape[1]) < self.frequency
+        frame[:, rows] = 0
 
 
 class Black(WindowEffect):
     """Makes entire screen black"""
 
-    def apply(self, display):
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        display.pixels[:] = 0
+        frame[:] = 0
 
 
 class Notch(WindowEffect):
     """Creates an IPhone like Notch for Apple fans"""
 
-    def apply(self, display):
+    def process(self, frame):
         """
-        Applies the effect to the current display
+        Applies the effect in place to a frame
         Args:
-            display: The current state of the display
+            frame: A float32 frame with shape (width, height, 3)
         """
-        display.pixels[3:7, 0] = 0
+        frame[3:7, 0] = 0
 
 
 class ColorPalette(WindowEffect):
+    """Quantizes the frame to a palette while keeping the palette balanced: pixel and color pairs are assigned closest
+    first and no color is used for more than ceil(n / k) of the n pixels, so a dark frame still uses the bright colors
+    of the palette instead of turning black. The assignment of the last frame is reused while the frame is unchanged.
+    """
+
     def __init__(self, *args, colors=[(0, 0, 0), (255, 255, 255)], **kwargs):
         super().__init__(*args, **kwargs)
         self.colors = colors
+        self.palette = np.array(colors, dtype=np.int32).reshape(-1, 3)
+        self.last_input = None
+        self.last_output = None
 
-    @staticmethod
-    def squared_distances(frame, color):
-        d1 = frame[:, :, 0] - color[0]
-        d2 = frame[:, :, 1] - color[1]
-        d3 = frame[:, :, 2] - color[2]
-        return np.sqrt(d1**2 + d2**2 + d3**2)
-
-    def apply(self, display):
-        scores = [
-            self.squared_distances(display.pixels.astype(np.int32), color).reshape(-1)
-            for color in self.colors
-        ]
+    def distances(self, pixels):
+        """Squared distances of every pixel to every palette color
 
-        sort_me = [
-            (scores[c][i], i, c)
-            for c in range(len(self.colors))
-            for i in range(display.width * display.height)
-        ]
-        sort_me.sort(key=lambda x: x[0], reverse=False)
-
-        max_count = math.ceil(display.width * display.height / len(self.colors))
-        counts = [0] * len(self.colors)
-        last_distances = [100000000] * len(self.colors)
-        for d, i, c in sort_me:
-            if counts[c] <= max_count or d == last_distances[c]:
-                display.pixels[i // display.height][i % display.height] = self.colors[c]
-                counts[c] += 1
-                last_distances[c] = d
+        Args:
+            pixels (np.ndarray): Pixels as int32 array of shape (n, 3)
         """
+        return (
+            (pixels * pixels).sum(axis=1)[:, None]
+            - 2 * pixels @ self.palette.T
+            + (self.palette * self.palette).sum(axis=1)[None, :]
+        )
+
+    def assign(self, pixels):
+        """Assigns every pixel the index of a palette color, pairs with smaller distances first and every color at
+        most ceil(n / k) times. Pixels propose to their colors from closest to farthest and every color holds the
+        closest proposals it has room for, which ends in the same assignment as going through all pairs sorted by
+        distance because pixels and colors rank each other by the same distance.
 
-
-
-        # min_distances = [np.min(d) for d in distances]
-        # max_distances = [np.max(d) for d in distances]
-        # scores = np.array([(distance - min_distance) / (max_distance - min_distance) for distance, min_distance, max_distance in zip(distances, min_distances, max_distances)])
-        indices = np.argmin(scores, axis=0)
-        for i, c in enumerate(self.colors):
-            display.pixels[np.where(indices==i)] = c
+        Args:
+            pixels (np.ndarray): Pixels as int32 array of shape (n, 3)
         """
+        n, k = len(pixels), len(self.palette)
+        capacity = -(-n // k)
+        distances = self.distances(pixels)
+        preferences = np.argsort(distances, axis=1, kind="stable")
+        proposals = np.zeros(n, dtype=np.intp)
+        assignment = np.full(n, -1, dtype=np.intp)
+        free = np.arange(n)
+        while free.size:
+            assignment[free] = preferences[free, proposals[free]]
+            proposals[free] += 1
+            # Every color keeps its closest candidates, ties go to the lower pixel index
+            candidates = np.flatnonzero(assignment >= 0)
+            colors = assignment[candidates]
+            order = np.lexsort((candidates, distances[candidates, colors], colors))
+            colors = colors[order]
+            starts = np.searchsorted(colors, colors)
+            free = candidates[order[np.arange(len(order)) - starts >= capacity]]
+            assignment[free] = -1
+        return assignment
+
+    def is_noop(self):
+        return len(self.colors) == 0
+
+    def process(self, frame):
+        # Earlier effects in the pipeline leave the frame unclamped, the palette has to see the final colors
+        pixels = np.clip(frame, 0, 255).astype(np.int32)
+        if self.last_input is None or not np.array_equal(pixels, self.last_input):
+            assignment = self.assign(pixels.reshape(-1, 3))
+            self.last_input = pixels
+            self.last_output = self.palette[assignment].reshape(frame.shape)
+        frame[...] = self.last_output
+
+
+_pipeline = EffectPipeline()
@@ -0,0 +1,230 @@
+"""Pixel buffers that keep track of which part of the display has been drawn to
+"""
+import numpy as np
+
+
+class DirtyRect:
+    """The smallest rectangle containing all pixels that were written since the last clear"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.clear()
+
+    def clear(self):
+        """Marks the whole display as clean"""
+        self.x0 = self.width
+        self.y0 = self.height
+        self.x1 = 0
+        self.y1 = 0
+
+    def add(self, x0, y0, x1, y1):
+        """Marks a rectangle as dirty, the upper bounds are exclusive"""
+        # Plain comparisons, this is called for every single pixel update
+        if x0 < self.x0:
+            self.x0 = x0 if x0 > 0 else 0
+        if y0 < self.y0:
+            self.y0 = y0 if y0 > 0 else 0
+        if x1 > self.x1:
+            self.x1 = x1 if x1 < self.width else self.width
+        if y1 > self.y1:
+            self.y1 = y1 if y1 < self.height else self.height
+
+    def add_all(self):
+        """Marks the whole display as dirty"""
+        self.x0 = 0
+        self.y0 = 0
+        self.x1 = self.width
+        self.y1 = self.height
+
+    def is_empty(self):
+        """Checks whether nothing was written since the last clear"""
+        return self.x0 >= self.x1 or self.y0 >= self.y1
+
+    def get_slices(self):
+        """Returns the dirty rectangle as slices, that can be used to index the pixels of a display"""
+        return slice(self.x0, self.x1), slice(self.y0, self.y1)
+
+
+def _is_basic_index(index):
+    """Checks whether indexing with this creates a view instead of a copy"""
+    if not isinstance(index, tuple):
+        index = (index,)
+    # Booleans are ints too, but numpy treats them as a mask and copies
+    return all(
+        (isinstance(i, (int, np.integer, slice)) and not isinstance(i, (bool, np.bool_)))
+        or i is Ellipsis
+        or i is None
+        for i in index
+    )
+
+
+class TrackedPixels(np.ndarray):
+    """A (width, height, 3) pixel buffer that reports every item assignment to a DirtyRect. This also works for
+    assignments to views of the buffer, e.g. `pixels[x][y] = color` or `pixels[2:5, 3:7][mask] = color`, their
+    position within the buffer is derived from their memory address.
+    """
+
+    @classmethod
+    def create(cls, width, height, dirty):
+        """Creates a new black buffer
+
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
+            dirty (DirtyRect): Where writes are reported to
+        """
+        pixels = np.zeros((width, height, 3), dtype=np.uint8).view(cls)
+        pixels.dirty = dirty
+        pixels.origin = (pixels.ctypes.data, pixels.nbytes, *pixels.strides[:2])
+        return pixels
+
+    def __array_finalize__(self, obj):
+        self.dirty = getattr(obj, "dirty", None)
+        self.origin = getattr(obj, "origin", None)
+
+    def __setitem__(self, index, value):
+        np.ndarray.__setitem__(self, index, value)
+        if self.dirty is None:
+            return
+
+        target = self
+        if _is_basic_index(index):
+            target = np.ndarray.__getitem__(self, index)
+            if not isinstance(target, np.ndarray):
+                target = self
+        self.mark(target)
+
+    def mark(self, target):
+        """Marks the region of the buffer that an array is looking at as dirty. Arrays that don't share the memory of
+        the buffer, like results of calculations, are ignored.
+        """
+        if target.size == 0:
+            return
+
+        address, nbytes, stride_x, stride_y = self.origin
+        offset = target.ctypes.data - address
+        if offset < 0 or offset >= nbytes:
+            return
+
+        x0, rest = divmod(offset, stride_x)
+        y0 = rest // stride_y
+        x1, y1 = x0, y0
+        for length, stride in zip(target.shape, target.strides):
+            span = (length - 1) * stride
+            if length <= 1 or abs(stride) < stride_y:
+                continue
+            elif stride % stride_x == 0:
+                x0, x1 = min(x0, x0 + span // stride_x), max(x1, x1 + span // stride_x)
+            elif abs(stride) < stride_x and stride % stride_y == 0:
+                y0, y1 = min(y0, y0 + span // stride_y), max(y1, y1 + span // stride_y)
+            else:
+                # Reshaped views can't be mapped to a rectangle
+                self.dirty.add_all()
+                return
+
+        if y0 < 0 or y1 >= self.dirty.height:
+            self.dirty.add_all()
+        else:
+            self.dirty.add(x0, y0, x1 + 1, y1 + 1)
+
+
+class FrameBuffer:
+    """A preallocated front and back buffer. Applications draw into the back buffer, the front buffer holds the frame
+    that is currently shown. Presenting a frame swaps the two instead of copying it, afterwards only the dirty region
+    is copied into the new back buffer, so drawing continues from the frame that is on screen. Nothing is allocated
+    in steady state, apart from the indices of changed pixels.
+    """
+
+    def __init__(self, width, height):
+        """
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
+        """
+        self.width = width
+        self.height = height
+        self.dirty = DirtyRect(width, height)
+        self.back = TrackedPixels.create(width, height, self.dirty)
+        self.front = TrackedPixels.create(width, height, self.dirty)
+        # Untracked views of the same memory, for writes that mark their region themselves
+        self.back_raw = self.back.view(np.ndarray)
+        self.front_raw = self.front.view(np.ndarray)
+
+        self._difference = np.zeros((width, height, 3), dtype=bool)
+        self._mask = np.zeros((width, height), dtype=bool)
+        self.changed = False
+        self.force()
+
+    def force(self):
+        """Marks every pixel as changed on the next call to `get_changes`, even if it is the same as on screen"""
+        self.forced = True
+        self.dirty.add_all()
+
+    def set(self, x, y, color):
+        """Sets a single pixel of the back buffer, without any checks"""
+        self.back_raw[x, y] = color
+        self.dirty.add(x, y, x + 1, y + 1)
+
+    def fill(self, color):
+        """Fills the back buffer with one color in place
+
+        Args:
+            color ((int, int, int)): The rgb color
+        """
+        self.back_raw[...] = color
+        self.dirty.add_all()
+
+    def clear(self):
+        """Fills the back buffer with black"""
+        self.fill(0)
+
+    def write_frame(self, frame):
+        """Copies a whole frame into the back buffer
+
+        Args:
+            frame (np.ndarray): The frame with shape (width, height, 3). Other dtypes are cast to uint8, views like
+            transposed images are fine.
+        """
+        if frame is not self.back:
+            np.copyto(self.back_raw, frame, casting="unsafe")
+        self.dirty.add_all()
+
+    def get_changes(self):
+        """Compares the dirty region of the back buffer with the front buffer
+
+        Returns:
+            ((np.ndarray, np.ndarray), np.ndarray): The x and y coordinates of all changed pixels and their new colors
+            with shape (n, 3), or None if nothing changed
+        """
+        self.changed = False
+        if self.dirty.is_empty():
+            return None
+
+        xs, ys = self.dirty.get_slices()
+        back = self.back_raw[xs, ys]
+        mask = self._mask[xs, ys]
+        if self.forced:
+            mask[...] = True
+            self.forced = False
+        else:
+            difference = self._difference[xs, ys]
+            np.not_equal(back, self.front_raw[xs, ys], out=difference)
+            np.logical_or.reduce(difference, axis=2, out=mask)
+
+        changed = mask.nonzero()
+        if len(changed[0]) == 0:
+            return None
+        self.changed = True
+        return (changed[0] + xs.start, changed[1] + ys.start), back[changed]
+
+    def present(self):
+        """Makes the back buffer the frame that is on screen"""
+        if self.changed:
+            self.back, self.front = self.front, self.back
+            self.back_raw, self.front_raw = self.front_raw, self.back_raw
+            # Only the dirty region can differ between the two buffers
+            xs, ys = self.dirty.get_slices()
+            self.back_raw[xs, ys] = self.front_raw[xs, ys]
+        self.changed = False
+        self.dirty.clear()
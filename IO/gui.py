@@ -38,7 +38,10 @@ class PygameController(core.Controller):
 
 
 class PygameDisplay(core.Display):
-    """A Display for pygame gui windows"""
+    """A Display for pygame gui windows. Changed pixels are written into a surface with one pixel per display pixel,
+    the rectangle around the changes is then scaled straight into the window and only that rectangle is updated on
+    screen.
+    """
 
     def __init__(self, win, screen_pos, screen_size, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,15 +58,39 @@ class PygameDisplay(core.Display):
         )
         self.screen_pos = (new_pos_x, new_pos_y)
 
-        pygame.draw.rect(self.win, (0, 0, 0), (*screen_pos, *screen_size))
+        # Same pixel format as the window, so it can be scaled into it without converting
+        self.surface = pygame.Surface((self.width, self.height), 0, self.win)
+        self.dirty = None
 
-    def _refresh(self):
+        pygame.draw.rect(self.win, (0, 0, 0), (*screen_pos, *screen_size))
         pygame.display.update()
 
-    def _update(self, x, y, color):
-        left = self.screen_pos[0] + self.pixel_size * x
-        top = self.screen_pos[1] + self.pixel_size * y
-        pygame.draw.rect(self.win, color, (left, top, self.pixel_size, self.pixel_size))
+    def _update_frame(self, indices, colors):
+        xs, ys = indices
+        if self.brightness != 1:
+            colors = colors * self.brightness
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        pixels[xs, ys] = colors
+        # Unlocks the surface again
+        del pixels
+
+        x0, y0 = xs.min(), ys.min()
+        self.dirty = pygame.Rect(x0, y0, xs.max() + 1 - x0, ys.max() + 1 - y0)
+
+    def _refresh(self):
+        if self.dirty is None:
+            return
+        area = pygame.Rect(
+            self.screen_pos[0] + self.dirty.x * self.pixel_size,
+            self.screen_pos[1] + self.dirty.y * self.pixel_size,
+            self.dirty.w * self.pixel_size,
+            self.dirty.h * self.pixel_size,
+        )
+        pygame.transform.scale(
+            self.surface.subsurface(self.dirty), area.size, self.win.subsurface(area)
+        )
+        pygame.display.update(area)
+        self.dirty = None
 
 
 class PygameIOManager(core.IOManager):
@@ -77,8 +104,16 @@ class PygameIOManager(core.IOManager):
         screen_pos=(0, 0),  # (150, 100),
         screen_size=(500, 750),
         screen_res=(10, 15),
+        headless=False,
         **kwargs
     ):
+        """
+        Args:
+            headless (bool, optional): Renders into an invisible window with SDL's dummy video driver, e.g. to
+            benchmark or record without a screen. Defaults to False.
+        """
+        if headless:
+            environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         pygame.display.set_caption(title)
 
@@ -0,0 +1,84 @@
+"""IO Management without any real input or output, e.g. for benchmarks
+"""
+from IO import core
+from IO.scheduler import FrameScheduler
+
+
+class VirtualClock:
+    """A clock that only advances when sleeping, so frames can be simulated as fast as possible"""
+
+    def __init__(self, start=0):
+        self.time = start
+
+    def now(self):
+        """Returns the current virtual time in seconds"""
+        return self.time
+
+    def sleep(self, duration):
+        """Advances the virtual time instead of sleeping"""
+        self.time += max(0, duration)
+
+
+class NullDisplay(core.Display):
+    """A Display that still keeps track of its pixels, but does not show them anywhere"""
+
+    def _update(self, x, y, color):
+        pass
+
+    def _update_frame(self, indices, colors):
+        pass
+
+
+class ScriptedController(core.Controller):
+    """A Controller that replays a fixed list of button events"""
+
+    def __init__(self, script=None):
+        """
+        Args:
+            script (list, optional): List of (frame, button name, pressed) tuples, e.g. (10, "button_a", True).
+            Defaults to no input at all.
+        """
+        super().__init__()
+        if script is None:
+            script = []
+        self.script = sorted(script, key=lambda event: event[0])
+        self.position = 0
+        self.frame = 0
+
+    def update(self):
+        """Applies all events of the current frame and advances to the next one"""
+        while (
+            self.position < len(self.script)
+            and self.script[self.position][0] <= self.frame
+        ):
+            _, button, pressed = self.script[self.position]
+            getattr(self, button).update(pressed)
+            self.position += 1
+        self.frame += 1
+
+
+class HeadlessIOManager(core.IOManager):
+    """IO Manager without real input, output or sleeping. Stops after a fixed number of frames."""
+
+    def __init__(
+        self, *args, script=None, max_frames=None, screen_res=(10, 15), display=None, **kwargs
+    ):
+        self.clock = VirtualClock()
+        self.max_frames = max_frames
+        self.frames = 0
+
+        controller = ScriptedController(script)
+        if display is None:
+            display = NullDisplay(*screen_res)
+        super().__init__(controller, display, *args, **kwargs)
+        self.scheduler = FrameScheduler(
+            policy=self.scheduler.policy, clock=self.clock.now, sleep=self.clock.sleep
+        )
+
+    def update(self):
+        """Update function that gets called every frame"""
+        if self.max_frames is not None and self.frames >= self.max_frames:
+            self.running = False
+            return
+        self.frames += 1
+        self.controller.update()
@@ -1,72 +1,86 @@
 """IO Management for led interfaces
 """
-import curses
-
-import IO.core
-import IO.color
-from IO import core, commandline
-from IO.commandline import CursesController, CursesDisplay
+from IO import core
+from IO.correction import ColorCorrection
+from IO.strips import PixelMapping, StripDisplay
 from rpi_ws281x.rpi_ws281x import *
 
 import gpiozero
 
-# LED strip configuration:
-LED_COUNT = 150  # Number of LED pixels.
-LED_PIN = 18  # GPIO pin connected to the pixels (18 uses PWM!).
+# LED strip configuration, the number of LEDs is given by the size of the display:
+SCREEN_RES = (10, 15)  # Width and height of the LED screen
+# Wiring of a screen that is a single panel, see IO.strips.PanelLayout. Every row of the costume's screen runs from
+# right to left. Screens made of several panels or strips are described with a PixelMapping instead.
+LED_LAYOUT = {"mirror_x": True}
+# Pin and channel of every strip, channel 1 is for GPIOs 13, 19, 41, 45 or 53, 18 uses PWM!
+LED_STRIPS = [{"pin": 18, "channel": 0}]
 LED_FREQ_HZ = 800000  # LED signal frequency in hertz (usually 800khz)
 LED_DMA = 10  # DMA channel to use for generating signal (try 10)
 LED_BRIGHTNESS = 255  # Set to 0 for darkest and 255 for brightest
 # True to invert the signal (when using NPN transistor level shift)
 LED_INVERT = False
-LED_CHANNEL = 0  # set to '1' for GPIOs 13, 19, 41, 45 or 53
+# Transmit frames on a separate thread, so the next frame renders while the last one is clocked out
+LED_THREADED = True
+LED_GAMMA = 2  # Gamma correction, makes dark colors look darker like on a normal screen
+LED_WHITE_BALANCE = (1.0, 1.0, 1.0)  # Calibration factor for red, green and blue
 
 
-class LEDDisplay(core.Display):
+class LEDDisplay(StripDisplay):
     """A Display for showing the output on the LED screen"""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.strip = Adafruit_NeoPixel(
-            LED_COUNT,
-            LED_PIN,
-            LED_FREQ_HZ,
-            LED_DMA,
-            LED_INVERT,
-            LED_BRIGHTNESS,
-            LED_CHANNEL,
+    def __init__(
+        self,
+        width,
+        height,
+        *args,
+        mapping=None,
+        strip_config=LED_STRIPS,
+        threaded=LED_THREADED,
+        gamma=LED_GAMMA,
+        white_balance=LED_WHITE_BALANCE,
+        **kwargs,
+    ):
+        """
+        Args:
+            width (int): Width of the screen
+            height (int): Height of the screen
+            mapping (PixelMapping, optional): How the LEDs are wired. Defaults to None, which is a single panel
+            wired like LED_LAYOUT.
+            strip_config (list, optional): Pin and channel of every strip of the mapping. Defaults to LED_STRIPS.
+            threaded (bool, optional): Whether frames are transmitted on a separate thread. Defaults to LED_THREADED.
+            gamma (float, optional): Gamma correction of the LEDs. Defaults to LED_GAMMA.
+            white_balance ((float, float, float), optional): Calibration of the LEDs. Defaults to LED_WHITE_BALANCE.
+        """
+        if mapping is None:
+            mapping = PixelMapping.single(width, height, **LED_LAYOUT)
+        if len(strip_config) < len(mapping.lengths):
+            raise ValueError(
+                f"The mapping uses {len(mapping.lengths)} strips but only {len(strip_config)} are configured"
+            )
+        strips = [
+            Adafruit_NeoPixel(
+                length,
+                config["pin"],
+                LED_FREQ_HZ,
+                LED_DMA,
+                LED_INVERT,
+                LED_BRIGHTNESS,
+                config["channel"],
+            )
+            for length, config in zip(mapping.lengths, strip_config)
+        ]
+        correction = ColorCorrection(gamma=gamma, white_balance=white_balance)
+        super().__init__(
+            width,
+            height,
+            *args,
+            strips=strips,
+            mapping=mapping,
+            correction=correction,
+            threaded=threaded,
+            **kwargs,
         )
-        self.strip.begin()
-
-    @staticmethod
-    def color_correct(color):
-        h, s, v = color.to_hsv()
-        v = (v / 255) ** 2
-        return IO.color.Color.from_hsv(h, s, v)
-
-    def _update(self, x, y, color):
-        index = y * 10 + 9 - x
-        color = self.color_correct(IO.color.Color(*color))
-        r, g, b = color
 
-        if r > 0:
-            r = max(1, r)
-        if g > 0:
-            g = max(1, g)
-        if b > 0:
-            b = max(1, b)
-
-        r = max(0, min(255, int(r)))
-        g = max(0, min(255, int(g)))
-        b = max(0, min(255, int(b)))
-
-        self.strip.setPixelColor(int(index), Color(r, g, b))
-
-    def _refresh(self):
-        self.strip.show()
-
-start_display = LEDDisplay(10, 15)
-start_display.start()
-del start_display
 
 class FasiBoiController(core.Controller):
     def __init__(self, *args, **kwargs):
@@ -117,7 +131,7 @@ class ShittyDisplay(core.Display):
 class LEDIOManager(core.IOManager):
     """LED Screen IO Manager"""
 
-    def __init__(self, *args, screen_res=(10, 15), **kwargs):
+    def __init__(self, *args, screen_res=SCREEN_RES, mapping=None, **kwargs):
         # curses.initscr()
         # self.win = curses.newwin(screen_res[1] + 4, screen_res[0] * 2 + 4, 2, 2)
 
@@ -129,7 +143,7 @@ class LEDIOManager(core.IOManager):
 
         controller = FasiBoiController()
         # display = ShittyDisplay(*screen_res)
-        display = LEDDisplay(*screen_res)
+        display = LEDDisplay(*screen_res, mapping=mapping)
 
         super().__init__(controller, display, *args, **kwargs)
 
@@ -141,7 +155,8 @@ class LEDIOManager(core.IOManager):
 
     def destroy(self):
         """Cleanup function that gets called after all applications are closed"""
-        pass
+        # Makes sure the off image is shown before the program exits
+        self.display.close()
         # curses.nocbreak()
         # curses.echo()
         # curses.endwin()
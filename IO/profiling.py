@@ -0,0 +1,169 @@
+"""Timing instrumentation for the stages of the main loop
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Keeps the last few samples of a value in a ring buffer and summarizes them on demand"""
+
+    def __init__(self, size=512):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+
+    def add(self, value):
+        """Adds a sample, overwriting the oldest one if the buffer is full"""
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def get_values(self):
+        """Returns the samples that are currently in the buffer"""
+        return self.samples[: min(self.count, len(self.samples))]
+
+    @staticmethod
+    def summarize(values, count=None):
+        """Summarizes a list of samples
+
+        Args:
+            values (np.ndarray): The samples
+            count (int, optional): The total number of samples ever recorded. Defaults to the number of given samples.
+
+        Returns:
+            dict: The count, median, 95th and 99th percentile and the maximum of the samples
+        """
+        if count is None:
+            count = len(values)
+        if len(values) == 0:
+            return {"count": count}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "count": count,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(np.max(values)),
+        }
+
+    def get_stats(self):
+        """Summarizes the samples that are currently in the buffer"""
+        return self.summarize(self.get_values(), self.count)
+
+
+class FrameProfiler:
+    """Measures how long each stage of a frame takes, separately for every application. A frame is started with
+    `begin_frame`, every call to `lap` then attributes the time since the previous lap to the given stage. This only
+    costs one clock read and one ring buffer write per stage, so it can stay on during normal operation.
+    """
+
+    TOTAL = "total"
+
+    def __init__(self, history=512, enabled=True, clock=time.perf_counter):
+        self.history = history
+        self.enabled = enabled
+        self.clock = clock
+        self.histograms = {}
+        self.current = None
+        self.frame_start = 0
+        self.last = 0
+
+    def begin_frame(self, application):
+        """Starts timing a new frame
+
+        Args:
+            application (str): Name of the application that is active during this frame
+        """
+        if not self.enabled:
+            return
+        histograms = self.histograms.get(application)
+        if histograms is None:
+            histograms = self.histograms[application] = {}
+        self.current = histograms
+        self.frame_start = self.last = self.clock()
+
+    def _add(self, stage, duration):
+        histogram = self.current.get(stage)
+        if histogram is None:
+            histogram = self.current[stage] = RollingHistogram(self.history)
+        histogram.add(duration)
+
+    def lap(self, stage):
+        """Attributes the time since the last lap (or the beginning of the frame) to the given stage
+
+        Args:
+            stage (str): Name of the stage that just finished
+        """
+        if not self.enabled or self.current is None:
+            return
+        now = self.clock()
+        self._add(stage, now - self.last)
+        self.last = now
+
+    def skip(self):
+        """Restarts the lap timer without attributing the elapsed time to any stage, e.g. after sleeping"""
+        if self.enabled:
+            self.last = self.clock()
+
+    def end_frame(self):
+        """Records the total duration of the frame, excluding skipped time"""
+        if not self.enabled or self.current is None:
+            return
+        self._add(self.TOTAL, self.last - self.frame_start)
+
+    def reset(self):
+        """Forgets all recorded samples"""
+        self.histograms = {}
+        self.current = None
+
+    def get_stats(self, application=None):
+        """Summarizes the recorded stage durations in seconds
+
+        Args:
+            application (str, optional): Only return the stages of this application. Defaults to None, which
+            combines the samples of all applications.
+
+        Returns:
+            dict: A summary as returned by `RollingHistogram.get_stats` per stage
+        """
+        if application is not None:
+            return {
+                stage: histogram.get_stats()
+                for stage, histogram in self.histograms.get(application, {}).items()
+            }
+
+        # Copies, this may be called from another thread while new applications and stages are added
+        combined = {}
+        for histograms in list(self.histograms.values()):
+            for stage, histogram in list(histograms.items()):
+                combined.setdefault(stage, []).append(histogram)
+        return {
+            stage: RollingHistogram.summarize(
+                np.concatenate([h.get_values() for h in histograms]),
+                sum(h.count for h in histograms),
+            )
+            for stage, histograms in combined.items()
+        }
+
+    def dump(self, path=os.path.join("resources", "appdata", "Profile.json"), extra=None):
+        """Writes the stats of all stages, combined and per application, to a json file
+
+        Args:
+            path (str, optional): Where to store the file. Defaults to "resources/appdata/Profile.json".
+            extra (dict, optional): Additional entries to store in the file. Defaults to None.
+        """
+        data = {
+            "time": time.time(),
+            "all": self.get_stats(),
+            "applications": {
+                application: self.get_stats(application)
+                for application in self.histograms
+            },
+        }
+        if extra is not None:
+            data.update(extra)
+        with open(path, "w+") as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,150 @@
+"""Binary protocol of the frames that are sent to web viewers
+
+Every message is a binary WebSocket message that starts with its type as one byte, all numbers are little endian.
+Pixels are numbered in the same order as the display stores them, column by column: index = x * height + y.
+
+- KEYFRAME: type, one padding byte, width and height as uint16, then the rgb colors of all pixels
+- DELTA: type, one padding byte, the number of changed pixels n as uint16, the n indices of the changed pixels as
+  uint16, then their n rgb colors
+- HEARTBEAT: only the type, nothing changed since the last message
+"""
+import struct
+import time
+
+import numpy as np
+
+KEYFRAME = 1
+DELTA = 2
+HEARTBEAT = 3
+
+_KEYFRAME_HEADER = struct.Struct("<BxHH")
+_DELTA_HEADER = struct.Struct("<BxH")
+_HEARTBEAT = bytes([HEARTBEAT])
+# Indices are sent as uint16, larger displays only get keyframes
+_MAX_DELTA_PIXELS = 1 << 16
+
+
+class FrameEncoder:
+    """Turns the changes of a display into protocol messages. A delta is only sent if it is smaller than a keyframe,
+    if nothing changed, a heartbeat is sent at most every `heartbeat_interval` seconds, so viewers can tell an idle
+    display from a lost connection.
+    """
+
+    def __init__(self, width, height, heartbeat_interval=1, clock=time.monotonic):
+        """
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
+            heartbeat_interval (float, optional): Seconds without changes after which a heartbeat is sent. Defaults to 1.
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+        """
+        self.width = width
+        self.height = height
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+        # The first message has to be a keyframe
+        self.keyframe_requested = True
+        self.last_message = None
+
+        # Header and index size of a delta against a header and all colors for a keyframe
+        size = width * height
+        self.max_delta = (
+            (3 * size + _KEYFRAME_HEADER.size - _DELTA_HEADER.size) // 5
+            if size <= _MAX_DELTA_PIXELS
+            else -1
+        )
+
+    def keyframe(self, frame):
+        """Encodes a whole frame
+
+        Args:
+            frame (np.ndarray): The frame with shape (width, height, 3)
+
+        Returns:
+            bytes: The message
+        """
+        return _KEYFRAME_HEADER.pack(KEYFRAME, self.width, self.height) + frame.tobytes()
+
+    def delta(self, indices, colors):
+        """Encodes the changed pixels of a frame
+
+        Args:
+            indices ((np.ndarray, np.ndarray)): The x and y coordinates of the changed pixels
+            colors (np.ndarray): The new colors of those pixels with shape (n, 3)
+
+        Returns:
+            bytes: The message
+        """
+        xs, ys = indices
+        flat = (xs * self.height + ys).astype("<u2")
+        return (
+            _DELTA_HEADER.pack(DELTA, len(flat))
+            + flat.tobytes()
+            + colors.astype(np.uint8, copy=False).tobytes()
+        )
+
+    def encode(self, changes, frame):
+        """Encodes the next frame of the display
+
+        Args:
+            changes (((np.ndarray, np.ndarray), np.ndarray)): The coordinates and colors of the changed pixels as
+            returned by `FrameBuffer.get_changes`, or None if nothing changed
+            frame (np.ndarray): The whole new frame with shape (width, height, 3)
+
+        Returns:
+            bytes: The message to send, or None if nothing has to be sent
+        """
+        now = self.clock()
+        if self.keyframe_requested:
+            self.keyframe_requested = False
+            message = self.keyframe(frame)
+        elif changes is not None:
+            indices, colors = changes
+            if len(colors) > self.max_delta:
+                message = self.keyframe(frame)
+            else:
+                message = self.delta(indices, colors)
+        elif (
+            self.last_message is None
+            or now - self.last_message >= self.heartbeat_interval
+        ):
+            message = _HEARTBEAT
+        else:
+            return None
+        self.last_message = now
+        return message
+
+
+class FrameDecoder:
+    """Applies protocol messages to a frame, like the web viewer does"""
+
+    def __init__(self):
+        self.frame = None
+
+    def apply(self, message):
+        """Applies a message
+
+        Args:
+            message (bytes): The message
+
+        Returns:
+            bool: Whether the frame changed
+        """
+        kind = message[0]
+        if kind == KEYFRAME:
+            _, width, height = _KEYFRAME_HEADER.unpack_from(message)
+            pixels = np.frombuffer(message, np.uint8, offset=_KEYFRAME_HEADER.size)
+            self.frame = pixels.reshape(width, height, 3).copy()
+            return True
+        if kind == DELTA:
+            if self.frame is None:
+                return False
+            _, count = _DELTA_HEADER.unpack_from(message)
+            offset = _DELTA_HEADER.size
+            indices = np.frombuffer(message, "<u2", count, offset)
+            colors = np.frombuffer(message, np.uint8, 3 * count, offset + 2 * count)
+            self.frame.reshape(-1, 3)[indices] = colors.reshape(-1, 3)
+            return True
+        if kind == HEARTBEAT:
+            return False
+        raise ValueError(f"Unknown message type {kind}")
@@ -0,0 +1,133 @@
+"""Recording of the display output to video files
+"""
+import os
+import queue
+import threading
+
+import cv2
+
+
+def upscale(pixels, scale):
+    """Upscales a frame for viewing on a normal screen
+
+    Args:
+        pixels (np.ndarray): The frame with shape (width, height, 3) in rgb
+        scale (int): How many screen pixels one display pixel should become in each direction
+
+    Returns:
+        np.ndarray: The upscaled frame with shape (height * scale, width * scale, 3) in bgr, as opencv expects it
+    """
+    width, height = pixels.shape[:2]
+    out = cv2.resize(
+        pixels.transpose(1, 0, 2),
+        (width * scale, height * scale),
+        interpolation=cv2.INTER_NEAREST,
+    )
+    return cv2.cvtColor(out, cv2.COLOR_RGB2BGR)
+
+
+class VideoRecorder:
+    """Records frames to a video file on a background thread. Only the raw frames are queued, upscaling and encoding
+    happen off the render thread.
+
+    Frames with a timestamp are placed on the fixed frame rate of the video: every frame is held until the next one is
+    due, so stretches rendered at a lower frame rate still play back at the right speed.
+
+    If the queue is full, the policy decides what happens:
+    - DROP: The frame is not recorded, so recording never slows down the display.
+    - BLOCK: The render thread waits until there is space again, so no frame is lost.
+    """
+
+    DROP = "drop"
+    BLOCK = "block"
+
+    FOURCCS = {
+        ".avi": "MJPG",
+        ".mp4": "mp4v",
+    }
+
+    def __init__(self, path, fps, scale=10, queue_size=64, policy=DROP):
+        if policy not in (self.DROP, self.BLOCK):
+            raise ValueError(f"Unknown queue policy {policy}")
+        self.path = path
+        self.fps = fps
+        self.scale = scale
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = None
+        self.recorded = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def supports(cls, path):
+        """Checks whether videos can be recorded to a file with that name"""
+        return os.path.splitext(path)[1].lower() in cls.FOURCCS
+
+    def write(self, pixels, timestamp=None):
+        """Queues a frame for recording
+
+        Args:
+            pixels (np.ndarray): The frame with shape (width, height, 3) in rgb, it is copied before queueing
+            timestamp (float, optional): When the frame was shown in seconds. Defaults to right after the previous
+            frame.
+        """
+        item = (pixels.copy(), timestamp)
+        if self.policy == self.BLOCK:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+
+    def _open(self, width, height):
+        fourcc = self.FOURCCS[os.path.splitext(self.path)[1].lower()]
+        self.writer = cv2.VideoWriter(
+            self.path,
+            cv2.VideoWriter_fourcc(*fourcc),
+            self.fps,
+            (width * self.scale, height * self.scale),
+        )
+
+    def _run(self):
+        # The latest frame and the index of the video frame it starts at, it is written once the next one arrives
+        pending, pending_index = None, 0
+        start = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, timestamp = item
+            if self.writer is None:
+                self._open(*frame.shape[:2])
+            if pending is None:
+                start = timestamp
+                pending = upscale(frame, self.scale)
+                continue
+
+            if timestamp is None or start is None:
+                index = pending_index + 1
+            else:
+                index = round((timestamp - start) * self.fps)
+            # A frame that replaces the previous one before it was due takes its place
+            if index > pending_index:
+                self._write(pending, index - pending_index)
+                pending_index = index
+            pending = upscale(frame, self.scale)
+
+        if pending is not None:
+            self._write(pending, 1)
+
+    def _write(self, image, count):
+        for _ in range(count):
+            self.writer.write(image)
+        self.recorded += count
+
+    def release(self):
+        """Writes all queued frames and closes the video file"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.release()
@@ -0,0 +1,183 @@
+"""Frame scheduling for the main loop
+"""
+import collections
+import threading
+import time
+
+
+FrameRecord = collections.namedtuple("FrameRecord", ["start", "used", "slack", "missed"])
+FrameRecord.__doc__ = """Timing of a single frame
+
+Args:
+    start (float): Monotonic time at which the frame started
+    used (float): How long the frame took to calculate in seconds
+    slack (float): Time left until the deadline when the frame was done, negative if it was late
+    missed (int): Number of deadlines that were missed by this frame
+"""
+
+
+class FrameScheduler:
+    """Paces the main loop on absolute deadlines of a monotonic clock, so frame times don't drift and wall clock jumps
+    don't stall the loop.
+
+    If a frame takes longer than its budget, the policy decides what happens:
+    - SKIP: The missed frames are dropped and the next frame starts on the next deadline, keeping the phase.
+    - CATCH_UP: The next frames start right away without sleeping until the schedule is met again. If the loop falls
+      behind by more than `max_lag` seconds, the schedule is reset instead.
+    """
+
+    SKIP = "skip"
+    CATCH_UP = "catch_up"
+
+    def __init__(
+        self,
+        policy=SKIP,
+        max_lag=0.25,
+        history=256,
+        clock=time.monotonic,
+        sleep=None,
+    ):
+        if policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError(f"Unknown overrun policy {policy}")
+        self.policy = policy
+        self.max_lag = max_lag
+        self.clock = clock
+        self.wake_event = threading.Event()
+        if sleep is None:
+            sleep = self._sleep
+        self.sleep = sleep
+        self.records = collections.deque(maxlen=history)
+        self.missed = 0
+        self.frames = 0
+        self.deadline = None
+        self.frame_time = None
+        self.frame_start = None
+
+    def start(self):
+        """(Re)starts the schedule, the first frame begins right away"""
+        self.deadline = self.clock()
+        self.frame_time = None
+
+    def begin_frame(self):
+        """Marks the beginning of a frame
+
+        Returns:
+            float: The time that passed since the previous frame according to the schedule. This only differs from
+            the frame period if frames were skipped or the schedule had to be reset.
+        """
+        if self.deadline is None:
+            self.start()
+
+        self.frame_start = self.clock()
+        if self.frame_time is None:
+            delta = 0
+        else:
+            delta = self.deadline - self.frame_time
+        self.frame_time = self.deadline
+        return delta
+
+    def end_frame(self, fps):
+        """Marks the end of a frame and sleeps until the next one is due
+
+        Args:
+            fps (float): The frame rate the next deadline is based on
+        """
+        period = 1 / fps
+        now = self.clock()
+        used = now - self.frame_start
+        self.deadline += period
+        slack = self.deadline - now
+
+        missed = 0
+        if slack < 0:
+            missed = int(-slack // period) + 1
+            if self.policy == self.SKIP:
+                self.deadline += missed * period
+            elif -slack > self.max_lag:
+                self.deadline = now
+
+        self.frames += 1
+        self.missed += missed
+        self.records.append(FrameRecord(self.frame_start, used, slack, missed))
+
+        wait = self.deadline - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+
+    def _sleep(self, duration):
+        if self.wake_event.wait(duration):
+            # Woken up early, the next frame starts right now
+            self.wake_event.clear()
+            self.deadline = min(self.deadline, self.clock())
+
+    def wake(self):
+        """Ends the current sleep early, e.g. because of new input. Can be called from any thread."""
+        self.wake_event.set()
+
+    def cancel_wake(self):
+        """Forgets a pending wake up, e.g. because the input that caused it has already been handled"""
+        self.wake_event.clear()
+
+    def get_stats(self):
+        """Summarizes the recorded frames
+
+        Returns:
+            dict: Number of frames and missed deadlines overall, as well as the mean budget used and the worst slack
+            of the recorded history.
+        """
+        if len(self.records) == 0:
+            return {"frames": self.frames, "missed": self.missed}
+        return {
+            "frames": self.frames,
+            "missed": self.missed,
+            "mean_used": sum(r.used for r in self.records) / len(self.records),
+            "min_slack": min(r.slack for r in self.records),
+        }
+
+
+class FrameRateGovernor:
+    """Lowers the frame rate while the display does not change, to save power. As soon as something changes, there is
+    new input or an effect is running, it jumps back to the full frame rate.
+    """
+
+    def __init__(self, min_fps=5, idle_time=1, ramp=0.5):
+        """
+        Args:
+            min_fps (float, optional): The lowest frame rate to ramp down to. None disables the governor. Defaults
+            to 5.
+            idle_time (float, optional): Seconds without any change before the frame rate is lowered. Defaults to 1.
+            ramp (float, optional): Factor the frame rate is multiplied with every idle frame. Defaults to 0.5.
+        """
+        self.min_fps = min_fps
+        self.idle_time = idle_time
+        self.ramp = ramp
+        self.fps = None
+        self.idle = 0
+        self.time_at_rate = collections.defaultdict(float)
+
+    def get_fps(self, max_fps, delta, active):
+        """Decides the frame rate for the next frame
+
+        Args:
+            max_fps (float): The frame rate the application would like to run at
+            delta (float): Time since the last frame
+            active (bool): Whether the frame changed, there was input or an effect is running
+
+        Returns:
+            float: The frame rate for the next frame
+        """
+        if active or self.fps is None or self.min_fps is None:
+            self.idle = 0
+            self.fps = max_fps
+        else:
+            self.idle += delta
+            if self.idle >= self.idle_time:
+                self.fps = max(min(self.min_fps, max_fps), self.fps * self.ramp)
+            self.fps = min(self.fps, max_fps)
+
+        self.time_at_rate[round(self.fps)] += 1 / self.fps
+        return self.fps
+
+    def get_report(self):
+        """Returns how many seconds were spent at each (rounded) frame rate"""
+        return dict(sorted(self.time_at_rate.items()))
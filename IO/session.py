@@ -0,0 +1,293 @@
+"""Compact recording and replay of whole sessions, with the raw frames and the controller input
+
+A session file starts with a header, followed by a list of records. Every record starts with its type and a timestamp
+in milliseconds since the start of the recording:
+- KEYFRAME: The whole frame as raw rgb bytes in (width, height, 3) order
+- DELTA: Number of changed pixels, their flat indices as uint16 and their new rgb colors. Displays with more pixels
+  than uint16 can index only store keyframes.
+- INPUT: Index of the button in BUTTONS and whether it was pressed or released
+- END: Marks the end of the recording, so the duration of the last frame is known
+
+Frames that did not change are not stored at all, the previous frame simply lasts until the timestamp of the next
+record.
+"""
+import mmap
+import os
+import struct
+import time
+
+import cv2
+import numpy as np
+
+from IO.recording import VideoRecorder, upscale
+
+MAGIC = b"FBSL"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBHH")
+RECORD = struct.Struct("<BI")
+COUNT = struct.Struct("<H")
+INPUT = struct.Struct("<BB")
+# Indices are stored as uint16, larger displays only get keyframes
+MAX_DELTA_PIXELS = 1 << 16
+
+KEYFRAME = 1
+DELTA = 2
+INPUT_EVENT = 3
+END = 4
+
+BUTTONS = [
+    "button_up",
+    "button_right",
+    "button_down",
+    "button_left",
+    "button_a",
+    "button_b",
+    "button_menu",
+    "button_teppich",
+]
+
+
+class SessionRecorder:
+    """Writes frames and controller input to a session file"""
+
+    def __init__(self, path, width, height, keyframe_interval=10):
+        """
+        Args:
+            path (str): Where to store the session
+            width (int): Width of the display
+            height (int): Height of the display
+            keyframe_interval (float, optional): Seconds after which a full frame is stored again, even if a delta
+            would be smaller. Defaults to 10.
+        """
+        self.width = width
+        self.height = height
+        self.keyframe_interval = keyframe_interval
+        self.deltas = width * height <= MAX_DELTA_PIXELS
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, width, height))
+
+        self.start = None
+        self.timestamp = 0
+        self.last_keyframe = None
+        self.last_pixels = None
+        self.buttons = [False] * len(BUTTONS)
+
+    def _timestamp(self, now):
+        if self.start is None:
+            self.start = now
+        self.timestamp = int(round((now - self.start) * 1000))
+        return self.timestamp
+
+    def write_frame(self, pixels, now):
+        """Stores a frame, if it changed since the last one
+
+        Args:
+            pixels (np.ndarray): The frame with shape (width, height, 3)
+            now (float): Time of the frame in seconds
+        """
+        timestamp = self._timestamp(now)
+        pixels = np.asarray(pixels, dtype=np.uint8)
+
+        if self.last_pixels is None or (
+            now - self.last_keyframe >= self.keyframe_interval
+        ):
+            self._write_keyframe(timestamp, pixels, now)
+            return
+
+        changed = np.flatnonzero(np.any(pixels != self.last_pixels, axis=2))
+        if len(changed) == 0:
+            return
+
+        # A delta costs 5 bytes per pixel, a keyframe 3
+        if not self.deltas or len(changed) * 5 >= pixels.size:
+            self._write_keyframe(timestamp, pixels, now)
+            return
+
+        colors = pixels.reshape(-1, 3)[changed]
+        self.file.write(RECORD.pack(DELTA, timestamp))
+        self.file.write(COUNT.pack(len(changed)))
+        self.file.write(changed.astype("<u2").tobytes())
+        self.file.write(colors.tobytes())
+        self.last_pixels.reshape(-1, 3)[changed] = colors
+
+    def _write_keyframe(self, timestamp, pixels, now):
+        self.file.write(RECORD.pack(KEYFRAME, timestamp))
+        self.file.write(np.ascontiguousarray(pixels).tobytes())
+        self.last_pixels = pixels.copy()
+        self.last_keyframe = now
+
+    def write_inputs(self, controller, now):
+        """Stores all buttons of the controller that changed since the last call
+
+        Args:
+            controller (IO.core.Controller): The controller
+            now (float): Time of the input in seconds
+        """
+        for i, name in enumerate(BUTTONS):
+            pressed = bool(getattr(controller, name)._value)
+            if pressed != self.buttons[i]:
+                self.buttons[i] = pressed
+                self.file.write(RECORD.pack(INPUT_EVENT, self._timestamp(now)))
+                self.file.write(INPUT.pack(i, pressed))
+
+    def close(self):
+        """Marks the end of the recording and closes the file"""
+        self.file.write(RECORD.pack(END, self.timestamp))
+        self.file.close()
+
+
+class SessionPlayer:
+    """Reads a session file without loading it into memory"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.width, self.height = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+        if version != VERSION:
+            raise ValueError(f"Unsupported session version {version}")
+
+        self.frame_size = self.width * self.height * 3
+
+    def records(self):
+        """Iterates over all records of the session
+
+        Yields:
+            (int, float, int): The type of the record, its time in seconds and the offset of its payload
+        """
+        offset = HEADER.size
+        while offset < len(self.data):
+            kind, timestamp = RECORD.unpack_from(self.data, offset)
+            offset += RECORD.size
+            yield kind, timestamp / 1000, offset
+
+            if kind == KEYFRAME:
+                offset += self.frame_size
+            elif kind == DELTA:
+                (count,) = COUNT.unpack_from(self.data, offset)
+                offset += COUNT.size + count * 5
+            elif kind == INPUT_EVENT:
+                offset += INPUT.size
+            elif kind == END:
+                return
+            else:
+                raise ValueError(f"Unknown record type {kind} at offset {offset}")
+
+    def frames(self):
+        """Iterates over all frames of the session. The same array is updated in place for every frame.
+
+        Yields:
+            (float, np.ndarray): The time of the frame in seconds and the frame with shape (width, height, 3)
+        """
+        pixels = np.zeros((self.width, self.height, 3), dtype=np.uint8)
+        flat = pixels.reshape(-1, 3)
+        for kind, timestamp, offset in self.records():
+            if kind == KEYFRAME:
+                flat[:] = np.frombuffer(
+                    self.data, dtype=np.uint8, count=self.frame_size, offset=offset
+                ).reshape(-1, 3)
+                yield timestamp, pixels
+            elif kind == DELTA:
+                (count,) = COUNT.unpack_from(self.data, offset)
+                offset += COUNT.size
+                indices = np.frombuffer(self.data, dtype="<u2", count=count, offset=offset)
+                colors = np.frombuffer(
+                    self.data, dtype=np.uint8, count=count * 3, offset=offset + count * 2
+                )
+                flat[indices] = colors.reshape(-1, 3)
+                yield timestamp, pixels
+
+    def inputs(self):
+        """Iterates over all controller inputs of the session
+
+        Yields:
+            (float, str, bool): The time of the input in seconds, the name of the button and whether it was pressed
+        """
+        for kind, timestamp, offset in self.records():
+            if kind == INPUT_EVENT:
+                button, pressed = INPUT.unpack_from(self.data, offset)
+                yield timestamp, BUTTONS[button], bool(pressed)
+
+    def get_duration(self):
+        """Returns the length of the session in seconds"""
+        duration = 0
+        for _, timestamp, _ in self.records():
+            duration = timestamp
+        return duration
+
+    def play(self, display, speed=1):
+        """Shows the session on a display in real time
+
+        Args:
+            display (IO.core.Display): Any display with the same resolution as the recording
+            speed (float, optional): Playback speed. Defaults to 1.
+        """
+        start = time.monotonic()
+        for timestamp, pixels in self.frames():
+            wait = start + timestamp / speed - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            display.write_frame(pixels)
+            display.refresh()
+
+    def sample(self, fps):
+        """Iterates over the session at a fixed frame rate, repeating frames that did not change
+
+        Yields:
+            np.ndarray: The frame that was visible at each point in time
+        """
+        duration = self.get_duration()
+        frames = self.frames()
+        current = np.zeros((self.width, self.height, 3), dtype=np.uint8)
+        upcoming = next(frames, None)
+
+        for i in range(int(duration * fps) + 1):
+            now = i / fps
+            while upcoming is not None and upcoming[0] <= now:
+                current[:] = upcoming[1]
+                upcoming = next(frames, None)
+            yield current
+
+    def export(self, path, fps=30, scale=10):
+        """Renders the session to a video (.mp4, .avi) or an animated .gif
+
+        Args:
+            path (str): Where to store the video
+            fps (int, optional): Frame rate of the video. Defaults to 30.
+            scale (int, optional): Size of one pixel in the video. Defaults to 10.
+        """
+        ending = os.path.splitext(path)[1].lower()
+        if ending == ".gif":
+            # Pillow is only needed for exporting gifs
+            from PIL import Image
+
+            images = [
+                Image.fromarray(cv2.cvtColor(upscale(frame, scale), cv2.COLOR_BGR2RGB))
+                for frame in self.sample(fps)
+            ]
+            images[0].save(
+                path,
+                save_all=True,
+                append_images=images[1:],
+                duration=1000 / fps,
+                loop=0,
+            )
+        elif VideoRecorder.supports(path):
+            writer = cv2.VideoWriter(
+                path,
+                cv2.VideoWriter_fourcc(*VideoRecorder.FOURCCS[ending]),
+                fps,
+                (self.width * scale, self.height * scale),
+            )
+            for frame in self.sample(fps):
+                writer.write(upscale(frame, scale))
+            writer.release()
+        else:
+            raise ValueError(f"Cannot export sessions as {ending}")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
@@ -0,0 +1,388 @@
+"""Mapping of the display onto LED strips, independent of the hardware library driving them
+"""
+import threading
+import time
+
+import numpy as np
+
+from IO import core
+from IO.correction import ColorCorrection
+
+
+class PanelLayout:
+    """Describes how the LEDs of one panel are wired. The LEDs of a panel are numbered row by row in its own
+    orientation, the panel is then mirrored, rotated and placed onto the display.
+    """
+
+    def __init__(
+        self,
+        width,
+        height,
+        x=0,
+        y=0,
+        serpentine=False,
+        rotation=0,
+        mirror_x=False,
+        mirror_y=False,
+        strip=0,
+        start=None,
+    ):
+        """
+        Args:
+            width (int): Number of LEDs in a row of the panel, before rotating it
+            height (int): Number of rows of the panel, before rotating it
+            x (int, optional): Column of the display the left edge of the panel is on. Defaults to 0.
+            y (int, optional): Row of the display the top edge of the panel is on. Defaults to 0.
+            serpentine (bool, optional): Whether every second row runs backwards, like with a single strip that is
+            folded into rows. Defaults to False, every row starts on the same side.
+            rotation (int, optional): Clockwise rotation of the panel in degrees, a multiple of 90. Defaults to 0.
+            mirror_x (bool, optional): Whether rows run from right to left. Defaults to False.
+            mirror_y (bool, optional): Whether the first row is at the bottom. Defaults to False.
+            strip (int, optional): Index of the strip the panel is connected to. Defaults to 0.
+            start (int, optional): Index of the first LED of the panel on its strip. Defaults to None, which
+            continues after the previous panel on the same strip.
+        """
+        if rotation % 90 != 0:
+            raise ValueError(f"Rotation {rotation} is not a multiple of 90 degrees")
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.serpentine = serpentine
+        self.rotation = rotation % 360
+        self.mirror_x = mirror_x
+        self.mirror_y = mirror_y
+        self.strip = strip
+        self.start = start
+
+    @property
+    def size(self):
+        """Width and height the panel covers on the display"""
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    def get_coordinates(self):
+        """Returns the display x and y coordinates of every LED of the panel, in the order of the strip"""
+        index = np.arange(self.width * self.height)
+        row, column = np.divmod(index, self.width)
+        if self.serpentine:
+            column = np.where(row % 2 == 1, self.width - 1 - column, column)
+        if self.mirror_x:
+            column = self.width - 1 - column
+        if self.mirror_y:
+            row = self.height - 1 - row
+
+        # Clockwise quarter turns
+        x, y, width, height = column, row, self.width, self.height
+        for _ in range(self.rotation // 90):
+            x, y, width, height = height - 1 - y, x, height, width
+        return x + self.x, y + self.y
+
+
+class PixelMapping:
+    """Lookup tables between the pixels of the display and the LEDs of one or more strips. They are computed once from
+    the panel layouts, so per frame the mapping is a single gather.
+    """
+
+    def __init__(self, width, height, panels):
+        """
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
+            panels (list): The PanelLayout of every panel
+
+        Raises:
+            ValueError: If a panel lies outside of the display or two LEDs show the same pixel
+        """
+        self.width = width
+        self.height = height
+        self.panels = panels
+
+        # Strip and LED index for every pixel of the display, -1 for pixels without LED
+        self.strips = np.full((width, height), -1, dtype=np.intp)
+        self.leds = np.full((width, height), -1, dtype=np.intp)
+
+        lengths = {}
+        for panel in panels:
+            xs, ys = panel.get_coordinates()
+            if xs.min() < 0 or ys.min() < 0 or xs.max() >= width or ys.max() >= height:
+                raise ValueError(
+                    f"Panel at ({panel.x}, {panel.y}) with size {panel.size} does not fit onto the {width}x{height} display"
+                )
+            if np.any(self.strips[xs, ys] >= 0):
+                raise ValueError(f"Panel at ({panel.x}, {panel.y}) overlaps another panel")
+            start = lengths.get(panel.strip, 0) if panel.start is None else panel.start
+            self.strips[xs, ys] = panel.strip
+            self.leds[xs, ys] = start + np.arange(len(xs))
+            lengths[panel.strip] = max(lengths.get(panel.strip, 0), start + len(xs))
+
+        # Number of LEDs on every strip, strips without panel have none
+        self.lengths = [lengths.get(strip, 0) for strip in range(max(lengths, default=-1) + 1)]
+        self.offsets = np.cumsum([0] + self.lengths)
+
+        # Flat pixel index for every LED of all strips one after the other, LEDs without pixel stay dark
+        self.sources = np.zeros(self.offsets[-1], dtype=np.intp)
+        self.dark = np.ones(self.offsets[-1], dtype=bool)
+        mapped = self.strips >= 0
+        self.complete = bool(mapped.all())
+        positions = self.offsets[self.strips[mapped]] + self.leds[mapped]
+        self.sources[positions] = np.flatnonzero(mapped)
+        self.dark[positions] = False
+        if not self.dark.any():
+            self.dark = None
+
+    @classmethod
+    def single(cls, width, height, **kwargs):
+        """Mapping of a display that is one panel on one strip
+
+        Args:
+            width (int): Width of the display
+            height (int): Height of the display
+            **kwargs: Further arguments of PanelLayout, e.g. serpentine or mirror_x
+        """
+        return cls(width, height, [PanelLayout(width, height, **kwargs)])
+
+    def locate(self, xs, ys):
+        """Looks up the LEDs of some pixels
+
+        Args:
+            xs (np.ndarray): X coordinates of the pixels
+            ys (np.ndarray): Y coordinates of the pixels
+
+        Returns:
+            (np.ndarray, np.ndarray): The strip and the LED index on it for every pixel, both -1 if the pixel has no
+            LED
+        """
+        return self.strips[xs, ys], self.leds[xs, ys]
+
+    def gather(self, frame):
+        """Reorders a whole frame into the order of the LEDs
+
+        Args:
+            frame (np.ndarray): Frame with shape (width, height, channels)
+
+        Returns:
+            list: An array with shape (length, channels) per strip
+        """
+        leds = frame.reshape(self.width * self.height, -1)[self.sources]
+        if self.dark is not None:
+            leds[self.dark] = 0
+        return np.split(leds, self.offsets[1:-1])
+
+
+class MockStrip:
+    """Stands in for a strip of rpi_ws281x, with the same methods the displays use. The colors are kept in an array
+    for inspection and every call of show is counted.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.colors = np.zeros(length, dtype=np.uint32)
+        self.shown = np.zeros(length, dtype=np.uint32)
+        self.shows = 0
+
+    def begin(self):
+        pass
+
+    def numPixels(self):
+        return self.length
+
+    def setPixelColor(self, index, color):
+        self.colors[index] = color
+
+    def getPixelColor(self, index):
+        return int(self.colors[index])
+
+    def show(self):
+        self.shown[:] = self.colors
+        self.shows += 1
+
+
+class SimulatedStrip(MockStrip):
+    """A MockStrip that takes as long to show a frame as a WS281x strip: every LED takes 24 bits at 800kHz and the
+    strip only latches the frame after the data line was low for a while. Sleeping releases the GIL like the driver
+    waiting for its DMA transfer, so the cost of transmitting can be measured on any machine.
+    """
+
+    LED_TIME = 24 / 800000
+    LATCH_TIME = 280e-6
+
+    def show(self):
+        time.sleep(self.length * self.LED_TIME + self.LATCH_TIME)
+        super().show()
+
+
+class Mailbox:
+    """Hands items from one thread to another, holding only the latest one. An item that was not taken yet is
+    replaced by a newer one, so the consumer always gets the most recent item and never works through a backlog.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.item = None
+        self.closed = False
+        self.replaced = 0
+
+    def put(self, item):
+        """Stores an item, replacing one that was not taken yet"""
+        with self.condition:
+            if self.item is not None:
+                self.replaced += 1
+            self.item = item
+            self.condition.notify()
+
+    def get(self):
+        """Waits for the next item
+
+        Returns:
+            The latest item, or None once the mailbox is closed and empty
+        """
+        with self.condition:
+            while self.item is None and not self.closed:
+                self.condition.wait()
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        """Wakes the consumer, it still gets the item that is waiting"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class StripOutput:
+    """Transmits frames to the strips on a background thread, so the next frame can be rendered while the last one
+    is clocked out. Frames go through a Mailbox, if transmitting falls behind rendering the latest frame wins.
+    """
+
+    def __init__(self, strips, offsets):
+        """
+        Args:
+            strips (list): The strips, with the interface of rpi_ws281x's PixelStrip
+            offsets (np.ndarray): Position of the first LED of every strip in the frames, plus the total length
+        """
+        self.strips = strips
+        self.offsets = offsets
+        self.mailbox = Mailbox()
+        self.last = None
+        self.transmitted = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def dropped(self):
+        """Number of frames that were replaced by a newer one before they were transmitted"""
+        return self.mailbox.replaced
+
+    def submit(self, leds):
+        """Queues a frame for transmission
+
+        Args:
+            leds (np.ndarray): Packed colors of all LEDs of all strips, as uint32. It is not copied, don't change it
+            afterwards.
+        """
+        self.mailbox.put(leds)
+
+    def _run(self):
+        while True:
+            leds = self.mailbox.get()
+            if leds is None:
+                break
+            changed = (
+                np.ones(len(leds), dtype=bool) if self.last is None else leds != self.last
+            )
+            for strip, start, end in zip(self.strips, self.offsets, self.offsets[1:]):
+                indices = np.flatnonzero(changed[start:end])
+                if len(indices) == 0:
+                    continue
+                for index, color in zip(indices.tolist(), leds[start + indices].tolist()):
+                    strip.setPixelColor(index, color)
+                strip.show()
+            self.last = leds
+            self.transmitted += 1
+
+    def close(self):
+        """Transmits the frame that is still waiting and stops the thread"""
+        self.mailbox.close()
+        self.thread.join()
+
+
+class StripDisplay(core.Display):
+    """A Display that is shown on one or more LED strips, e.g. the costume's screen or a mock in a test"""
+
+    def __init__(
+        self, *args, strips=None, mapping=None, correction=None, threaded=False, **kwargs
+    ):
+        """
+        Args:
+            strips (list, optional): Strips with the interface of rpi_ws281x's PixelStrip, one per strip index of the
+            mapping. Defaults to None, which uses a MockStrip for every strip.
+            mapping (PixelMapping, optional): How the pixels are wired. Defaults to None, which is a single panel
+            whose rows all run from right to left.
+            correction (ColorCorrection, optional): Correction of the colors for the LEDs. Defaults to None, which
+            creates one without gamma.
+            threaded (bool, optional): Whether the strips are written and shown by a StripOutput thread, while the
+            next frame is rendered. Defaults to False, which shows every frame during refresh.
+        """
+        super().__init__(*args, **kwargs)
+        if mapping is None:
+            mapping = PixelMapping.single(self.width, self.height, mirror_x=True)
+        if strips is None:
+            strips = [MockStrip(length) for length in mapping.lengths]
+        if len(strips) < len(mapping.lengths):
+            raise ValueError(
+                f"The mapping uses {len(mapping.lengths)} strips but only {len(strips)} are given"
+            )
+        if correction is None:
+            correction = ColorCorrection(gamma=1, brightness=self.brightness, minimum=0)
+        self.mapping = mapping
+        self.strips = strips
+        self.correction = correction
+        self.dirty_strips = set()
+        for strip in self.strips:
+            strip.begin()
+
+        # All LEDs one strip after the other, the threaded output transmits copies of it
+        self.leds = np.zeros(mapping.offsets[-1], dtype=np.uint32)
+        self.output = StripOutput(self.strips, mapping.offsets) if threaded else None
+
+    def _update_frame(self, indices, colors):
+        strips, leds = self.mapping.locate(*indices)
+        if not self.mapping.complete:
+            mapped = leds >= 0
+            strips, leds, colors = strips[mapped], leds[mapped], colors[mapped]
+
+        # Brightness is part of the lookup table, it is only rebuilt if the brightness changed
+        self.correction.set_brightness(self.brightness)
+        colors = self.correction.apply(colors).astype(np.uint32)
+
+        # Same layout as rpi_ws281x.Color, the library reorders to GRB itself
+        packed = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+        if self.output is not None:
+            self.leds[self.mapping.offsets[strips] + leds] = packed
+        elif len(self.strips) == 1:
+            strip = self.strips[0]
+            for led, color in zip(leds.tolist(), packed.tolist()):
+                strip.setPixelColor(led, color)
+            self.dirty_strips.add(0)
+        else:
+            for strip, led, color in zip(strips.tolist(), leds.tolist(), packed.tolist()):
+                self.strips[strip].setPixelColor(led, color)
+            self.dirty_strips.update(np.unique(strips).tolist())
+
+    def _refresh(self):
+        if self.output is not None:
+            if self.changed:
+                self.output.submit(self.leds.copy())
+        else:
+            for strip in self.dirty_strips:
+                self.strips[strip].show()
+        self.dirty_strips.clear()
+
+    def close(self):
+        """Waits until the last frame is shown and stops the output thread"""
+        if self.output is not None:
+            self.output.close()
+            self.output = None
@@ -1,97 +1,504 @@
 """IO Management for pygame interfaces
 """
 import os
-from IO import core
+from IO import core, protocol
 from IO.commandline import CursesController
+from IO.profiling import RollingHistogram
+from IO.recording import upscale
 import numpy as np
 import asyncio
-from websockets import serve
+import contextlib
+import cv2
+import email.utils
+import gzip
+import hashlib
+import json
+import mimetypes
+import socket
+import urllib.parse
+from http import HTTPStatus
+from websockets.asyncio.server import serve
+from websockets.datastructures import Headers
+from websockets.exceptions import ConnectionClosed
+from websockets.http11 import Response
 import threading
 import time
 import queue
 
-import http.server
-import socketserver
 
+class StaticFiles:
+    """The files of a directory, read and gzip compressed once when starting, so requests are answered from memory.
+    Every file gets an ETag, browsers check it on every page load and only download the file again if it changed.
+    """
 
-class FasiBoiHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(
-            *args, directory=os.path.join("resources", "misc", "webui"), **kwargs
+    def __init__(self, root, index="index.html"):
+        """
+        Args:
+            root (str): The directory
+            index (str, optional): The file that is served for "/". Defaults to "index.html".
+        """
+        self.files = {}
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            self.files["/" + name] = {
+                "body": body,
+                "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+                "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+                "type": content_type,
+            }
+        if "/" + index in self.files:
+            self.files["/"] = self.files["/" + index]
+
+    def get(self, path):
+        """Returns the file at an url path, or None if there is none"""
+        return self.files.get(path)
+
+
+class ClientMailbox:
+    """Holds the next message for one client, the asyncio counterpart of IO.strips.Mailbox. A message that was not sent
+    yet is replaced by a newer one, so a slow client skips frames instead of falling further and further behind.
+    Only lives on the event loop.
+    """
+
+    def __init__(self, address=None):
+        """
+        Args:
+            address (tuple, optional): The host and port the client connected from, for the stats
+        """
+        self.address = address
+        self.message = None
+        self.queued = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.bytes = 0
+        # Seconds from queueing the oldest unsent message until the client got a message
+        self.lag = RollingHistogram()
+
+    def put(self, message, snapshot=None):
+        """Stores a message, replacing one that was not sent yet
+
+        Args:
+            message (bytes | str): The message
+            snapshot (bytes | str, optional): A message that makes up for all earlier ones, it is stored instead if an
+            earlier message has to be skipped. Defaults to the message itself, for messages that don't build on each
+            other.
+        """
+        if self.message is not None:
+            self.dropped += 1
+            if snapshot is not None:
+                message = snapshot
+        else:
+            self.queued = time.time()
+        self.message = message
+        self.ready.set()
+
+    async def get(self):
+        """Waits for the next message
+
+        Returns:
+            (bytes | str, float): The message and the time.time() the oldest message it replaces was queued at
+        """
+        await self.ready.wait()
+        self.ready.clear()
+        message, self.message = self.message, None
+        return message, self.queued
+
+    def get_stats(self):
+        """Returns the number of messages sent and skipped, the bytes sent, whether a message is waiting and the lag of
+        this client
+        """
+        return {
+            "address": self.address,
+            "pending": self.message is not None,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "bytes": self.bytes,
+            "lag": self.lag.get_stats(),
+        }
+
+
+class FrameImages:
+    """The current frame as PNG or JPEG images for the snapshot and MJPEG endpoints. Every frame is encoded at most
+    once per format and scale, no matter how many viewers there are, and only once someone asks for it, so nothing is
+    encoded while no one is watching or while the frame stays the same. Encoding runs in the default executor of the
+    event loop. Only lives on the event loop.
+    """
+
+    FORMATS = {"png": ".png", "jpeg": ".jpg"}
+
+    def __init__(self, jpeg_quality=90):
+        """
+        Args:
+            jpeg_quality (int, optional): Quality of the JPEG images from 0 to 100. Defaults to 90.
+        """
+        self.jpeg_quality = jpeg_quality
+        self.frame = None
+        self.version = 0
+        # Replaced by a new event every time it is set, so waiting for it means waiting for the next frame
+        self.changed = asyncio.Event()
+        self.cache = {}
+        self.encoded = 0
+
+    def update(self, frame):
+        """Makes a frame the current one
+
+        Args:
+            frame (np.ndarray): The frame with shape (width, height, 3), it must not be changed afterwards
+        """
+        self.frame = frame
+        self.version += 1
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def _encode(self, frame, image_format, scale):
+        params = []
+        if image_format == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        _, data = cv2.imencode(
+            self.FORMATS[image_format], upscale(frame, scale), params
         )
+        return data.tobytes()
+
+    async def get(self, image_format, scale):
+        """Returns the current frame as an image, encoding it if this hasn't been done yet
+
+        Args:
+            image_format (str): "png" or "jpeg"
+            scale (int): How many image pixels one display pixel becomes in each direction
+
+        Returns:
+            bytes: The encoded image, or None if there is no frame yet
+        """
+        if self.frame is None:
+            return None
+        key = (image_format, scale)
+        version, image = self.cache.get(key, (None, None))
+        if version != self.version:
+            image = asyncio.get_running_loop().run_in_executor(
+                None, self._encode, self.frame, image_format, scale
+            )
+            self.cache[key] = (self.version, image)
+            self.encoded += 1
+        # Other viewers might still be waiting for the same image
+        return await asyncio.shield(image)
+
+
+class WebServer:
+    """Serves the web UI, the frame stream and metrics on a single port, from one asyncio event loop on its own
+    thread. Requests for `/ws` are upgraded to a websocket, `/metrics` returns the stats as json, `/frame.png` the
+    current frame and `/stream.mjpg` streams the frames as MJPEG, both upscaled by the `scale` parameter of the query.
+    Every other path is looked up in the static files.
 
+    The server is also the bridge to the render thread: frames are handed to the loop with `call_soon_threadsafe`
+    and put into a ClientMailbox per client, each connection has a task that sends from its mailbox and a task that
+    receives its messages as soon as they arrive. Clients are sent to concurrently, a slow one only skips frames
+    itself. Received messages are queued for the render thread together with the time they arrived at.
+    """
 
-class Websocket:
-    def __init__(self, *args, **kwargs):
+    WEBSOCKET_PATH = "/ws"
+    METRICS_PATH = "/metrics"
+    SNAPSHOT_PATH = "/frame.png"
+    STREAM_PATH = "/stream.mjpg"
+    MAX_SCALE = 64
+
+    def __init__(
+        self,
+        *args,
+        root=os.path.join("resources", "misc", "webui"),
+        metrics=None,
+        on_message=None,
+        write_limit=4096,
+        **kwargs,
+    ):
+        """
+        Args:
+            *args, **kwargs: Arguments of websockets.asyncio.server.serve, e.g. host and port
+            root (str, optional): Directory of the web UI. Defaults to resources/misc/webui.
+            metrics (callable, optional): Returns a dict of additional metrics, called from the server thread
+            on_message (callable, optional): Called from the server thread whenever a message was received
+            write_limit (int, optional): Bytes buffered per connection before sending waits. Kept small, so frames
+            pile up in the mailbox of a slow client, where they are skipped, instead of the socket. Defaults to 4096.
+        """
         self.args = args
-        self.kwargs = kwargs
-        self.running = True
-        self._websocket_instances = []
-        self._output = queue.Queue()
+        # MJPEG streams are answered from within the opening handshake, it must not time out
+        self.kwargs = dict(
+            kwargs,
+            write_limit=write_limit,
+            process_request=self._process_request,
+            open_timeout=None,
+        )
+        self.write_limit = write_limit
+        self.static = StaticFiles(root)
+        self.images = FrameImages()
+        self.streams = 0
+        self.metrics = metrics
+        self.on_message = on_message
+        self.loop = None
+        self._clients = set()
+        self._stream_tasks = set()
+        self._snapshot = None
         self._input = queue.Queue()
+        self._started = threading.Event()
+        self._stopped = None
 
     def __enter__(self):
         self.thread = threading.Thread(
             target=self._async_run, args=self.args, kwargs=self.kwargs
         )
         self.thread.start()
+        self._started.wait()
         return self
 
     def __exit__(self, *args, **kwargs):
-        self.running = False
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopped.set)
         self.thread.join()
 
-    def send(self, data):
-        self._output.put(data)
+    def send(self, data, snapshot=None, frame=None):
+        """Sends data to all connected clients. Can be called from any thread, it never blocks.
+
+        Args:
+            data (bytes | str): The message
+            snapshot (bytes | str, optional): A message that makes up for this and all earlier messages, e.g. a
+            keyframe. It is sent to clients that had to skip messages and to new clients. Defaults to the message
+            itself.
+            frame (np.ndarray, optional): The new frame for the image endpoints, if it changed. It must not be changed
+            afterwards.
+        """
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._broadcast, data, snapshot, frame)
 
     def receive(self):
+        """Returns the oldest unread message of any client
+
+        Returns:
+            (float, str): The time.time() the message was received at and the message
+        """
         return self._input.get()
 
     def unread_messages(self):
         return not self._input.empty()
 
+    def get_stats(self):
+        """Returns the stats of all connected clients, see ClientMailbox.get_stats"""
+        return [client.get_stats() for client in list(self._clients)]
+
+    def get_metrics(self):
+        """Returns the stats of all clients and the additional metrics"""
+        metrics = {
+            "clients": self.get_stats(),
+            "images": {"encoded": self.images.encoded, "streams": self.streams},
+        }
+        if self.metrics is not None:
+            metrics.update(self.metrics())
+        return metrics
+
     def _async_run(self, *args, **kwargs):
         asyncio.run(self._start_websocket(*args, **kwargs))
 
     async def _start_websocket(self, *args, **kwargs):
-        async with serve(self._register, *args, **kwargs):
-            while self.running:
-                # send data
-                while not self._output.empty():
-                    data = self._output.get()
-                    for websocket in self._websocket_instances:
-                        if websocket.closed:
-                            self._websocket_instances.remove(websocket)
-                        else:
-                            await websocket.send(data)
-
-                    # receive data
-                    for websocket in self._websocket_instances:
-                        while len(websocket.messages) > 0:
-                            msg = await websocket.recv()
-                            self._input.put(msg)
-                await asyncio.sleep(0.05)
-
-    async def _register(self, websocket, path):
-        self._websocket_instances.append(websocket)
-        while self.running:
-            await asyncio.sleep(1)
+        self._stopped = asyncio.Event()
+        try:
+            async with serve(self._register, *args, **kwargs):
+                self.loop = asyncio.get_running_loop()
+                self._started.set()
+                await self._stopped.wait()
+                # Streams never end on their own, closing the server would wait for them forever
+                for task in list(self._stream_tasks):
+                    task.cancel()
+        finally:
+            self.loop = None
+            # Don't keep __enter__ waiting if the server could not be started
+            self._started.set()
+
+    @staticmethod
+    def _respond(status, body=b"", headers=()):
+        headers = Headers(
+            [
+                ("Date", email.utils.formatdate(usegmt=True)),
+                ("Connection", "close"),
+                ("Content-Length", str(len(body))),
+                *headers,
+            ]
+        )
+        return Response(status.value, status.phrase, headers, body)
+
+    async def _process_request(self, connection, request):
+        """Answers every request that is not for the websocket with a plain HTTP response"""
+        url = urllib.parse.urlsplit(request.path)
+        path = url.path
+        if path == self.WEBSOCKET_PATH:
+            return None
+
+        if path in (self.SNAPSHOT_PATH, self.STREAM_PATH):
+            try:
+                scale = int(urllib.parse.parse_qs(url.query).get("scale", ["10"])[0])
+            except ValueError:
+                scale = 0
+            if not 1 <= scale <= self.MAX_SCALE:
+                return self._respond(
+                    HTTPStatus.BAD_REQUEST,
+                    f"scale must be between 1 and {self.MAX_SCALE}".encode(),
+                    [("Content-Type", "text/plain")],
+                )
+            if path == self.STREAM_PATH:
+                return await self._stream(connection, scale)
+
+            image = await self.images.get("png", scale)
+            if image is None:
+                return self._respond(
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    b"No frame yet",
+                    [("Content-Type", "text/plain")],
+                )
+            return self._respond(
+                HTTPStatus.OK,
+                image,
+                [("Content-Type", "image/png"), ("Cache-Control", "no-store")],
+            )
+
+        if path == self.METRICS_PATH:
+            body = json.dumps(self.get_metrics()).encode()
+            return self._respond(
+                HTTPStatus.OK,
+                body,
+                [("Content-Type", "application/json"), ("Cache-Control", "no-store")],
+            )
+
+        file = self.static.get(path)
+        if file is None:
+            return self._respond(
+                HTTPStatus.NOT_FOUND, b"Not Found", [("Content-Type", "text/plain")]
+            )
+
+        # Browsers revalidate every time, which is cheap thanks to the ETag
+        headers = [
+            ("ETag", file["etag"]),
+            ("Cache-Control", "no-cache"),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if file["etag"] in request.headers.get("If-None-Match", ""):
+            return self._respond(HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        headers.append(("Content-Type", file["type"]))
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers.append(("Content-Encoding", "gzip"))
+            return self._respond(HTTPStatus.OK, file["gzip"], headers)
+        return self._respond(HTTPStatus.OK, file["body"], headers)
+
+    async def _stream(self, connection, scale):
+        """Streams the frames as MJPEG until the client disconnects. A client that can't keep up skips frames."""
+        transport = connection.transport
+        transport.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+            b"Cache-Control: no-store\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        self.streams += 1
+        self._stream_tasks.add(asyncio.current_task())
+        version = None
+        try:
+            while not transport.is_closing() and not self._stopped.is_set():
+                if transport.get_write_buffer_size() > self.write_limit:
+                    await asyncio.sleep(0.05)
+                    continue
+                if version == self.images.version or self.images.frame is None:
+                    # Wake up now and then to notice when the client is gone
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self.images.changed.wait(), 1)
+                    continue
+                version = self.images.version
+                image = await self.images.get("jpeg", scale)
+                transport.write(
+                    b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%b\r\n"
+                    % (len(image), image)
+                )
+        finally:
+            self.streams -= 1
+            self._stream_tasks.discard(asyncio.current_task())
+            transport.close()
+        # The connection is closed, so this is never sent
+        return self._respond(HTTPStatus.OK)
+
+    def _broadcast(self, data, snapshot, frame):
+        if frame is not None:
+            self.images.update(frame)
+        self._snapshot = data if snapshot is None else snapshot
+        for client in self._clients:
+            client.put(data, snapshot)
+
+    async def _register(self, websocket):
+        client = ClientMailbox(websocket.remote_address)
+        # The kernel would otherwise buffer seconds of frames for a slow client as well
+        sock = websocket.transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.write_limit)
+        # New clients start from the latest snapshot instead of waiting for the next one
+        if self._snapshot is not None:
+            client.put(self._snapshot)
+        self._clients.add(client)
+        sender = asyncio.create_task(self._send_frames(websocket, client))
+        try:
+            async for message in websocket:
+                self._input.put((time.time(), message))
+                if self.on_message is not None:
+                    self.on_message()
+        except ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(client)
+            sender.cancel()
+
+    @staticmethod
+    async def _send_frames(websocket, client):
+        try:
+            while True:
+                message, queued = await client.get()
+                await websocket.send(message)
+                client.lag.add(time.time() - queued)
+                client.sent += 1
+                client.bytes += len(message)
+        except ConnectionClosed:
+            pass
 
 
 class WebDisplay(core.Display):
-    """A Display for pygame gui windows"""
+    """A Display that sends its frames to web browsers, see IO.protocol for the format"""
 
-    def __init__(self, websocket, *args, **kwargs):
+    def __init__(self, websocket, *args, heartbeat_interval=1, **kwargs):
         super().__init__(*args, **kwargs)
         self.websocket = websocket
-        self.full_refresh_threshold = self.width * self.height * 3 / 4
+        self.encoder = protocol.FrameEncoder(
+            self.width, self.height, heartbeat_interval=heartbeat_interval
+        )
+        self.changes = None
         self.refresh()
 
-    def refresh(self):
-        """Shows changes on the screen. Only updated pixels that have been changed
-        since last call to this function.
-        """
-        self.websocket.send(self.pixels.tobytes().hex())
+    def _update_frame(self, indices, colors):
+        self.changes = indices, colors
+
+    def _refresh(self):
+        message = self.encoder.encode(self.changes, self.last_pixels)
+        self.changes = None
+        if message is not None:
+            # Clients that skip a delta or connect later get the whole frame instead
+            if message[0] == protocol.KEYFRAME:
+                snapshot = message
+            else:
+                snapshot = self.encoder.keyframe(self.last_pixels)
+            frame = None
+            if message[0] != protocol.HEARTBEAT:
+                frame = self.last_pixels.view(np.ndarray).copy()
+            self.websocket.send(message, snapshot, frame)
 
 
 class WebController(core.Controller):
@@ -110,6 +517,8 @@ class WebController(core.Controller):
             "q": self.button_menu,  # Q
             "t": self.button_teppich,  # T
         }
+        # Seconds between receiving an input and applying it in the main loop
+        self.input_delay = RollingHistogram()
 
     def update(self):
         """
@@ -118,11 +527,12 @@ class WebController(core.Controller):
             char: The character representation of the pressed key
         """
         while self.websocket.unread_messages():
-            msg = self.websocket.receive()
+            timestamp, msg = self.websocket.receive()
+            self.input_delay.add(time.time() - timestamp)
             msg_lower = msg.lower()
             if msg_lower in self.keymap:
                 # uppercase: press, lowercase: release
-                self.keymap[msg_lower].update(msg != msg.lower())
+                self.keymap[msg_lower].update(msg != msg_lower, timestamp)
 
 
 class WebIOManager(core.IOManager):
@@ -136,34 +546,34 @@ class WebIOManager(core.IOManager):
         screen_pos=(0, 0),  # (150, 100),
         screen_size=(500, 750),
         screen_res=(10, 15),
+        port=8000,
         **kwargs,
     ):
 
-        self.websocket = Websocket("", 8001).__enter__()
-        display = WebDisplay(self.websocket, *screen_res)
-        controller = WebController(self.websocket)
-        self.start_http()
+        self.server = WebServer("", port).__enter__()
+        display = WebDisplay(self.server, *screen_res)
+        controller = WebController(self.server)
         super().__init__(controller, display, *args, **kwargs)
-
-    def start_http(self):
-        PORT = 8000
-        self.http_server = socketserver.TCPServer(("", PORT), FasiBoiHTTPRequestHandler)
-        self.http_server_thread = threading.Thread(
-            target=self.http_server.serve_forever
-        )
-        self.http_server.allow_reuse_address = True
-        self.http_server_thread.start()
+        # Start the next frame as soon as input arrives instead of at its deadline
+        self.server.on_message = self.wake_up
+        self.server.metrics = self.get_metrics
         print()
-        print(f"Fasiboy is running here: http://localhost:{PORT}")
+        print(f"Fasiboy is running here: http://localhost:{port}")
         print(f"Fasiboy might need up to 1min to fully start, please be patient")
 
+    def get_metrics(self):
+        """Returns the frame timings, the time spent at each frame rate and the input delay, for /metrics"""
+        return {
+            "profile": self.profiler.get_stats(),
+            "frame_rates": self.governor.get_report(),
+            "input_delay": self.controller.input_delay.get_stats(),
+        }
+
     def update(self):
         self.controller.update()
 
     def destroy(self):
         """Cleanup function that gets called after all applications are closed"""
-        self.websocket.__exit__()
         print("Waiting for shutdown")
-        self.http_server.server_close()
-        self.http_server_thread.join()
-        print("Shutdown http")
+        self.server.__exit__()
+        print("Shutdown server")
@@ -57,9 +57,8 @@ class VideoPlayer(core.Application):
                 (io.display.width, io.display.height),
                 interpolation=self.interpolation,
             )
-            converted = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-
-            io.display.pixels = converted.transpose(1, 0, 2)
+            # Reversing the channels as a view saves converting into a new image
+            io.display.write_frame(resized[:, :, ::-1].transpose(1, 0, 2))
 
         elif self.video_frames < 0:
             self.progression = 0
@@ -2,16 +2,18 @@ from applications import core
 from IO.color import *
 from helpers import textutils, bitmaputils
 import datetime
+import numpy as np
 
 
 class Colors(core.Application):
     def update(self, io, delta):
-        for x in range(io.display.width):
-            for y in range(io.display.height):
-                hue = x / io.display.width
-                vert_box = (io.display.height - y - 1) % io.display.height // 3
-                value = (1 + vert_box) / (io.display.height // 3)
-                saturation = 1 - (y % 3) / 3
-                io.display.update(x, y, Color.from_hsv(hue, saturation, value))
+        x, y = np.meshgrid(
+            np.arange(io.display.width), np.arange(io.display.height), indexing="ij"
+        )
+        hue = x / io.display.width
+        vert_box = (io.display.height - y - 1) % io.display.height // 3
+        value = (1 + vert_box) / (io.display.height // 3)
+        saturation = 1 - (y % 3) / 3
+        io.display.write_frame(hsv_to_rgb(np.stack([hue, saturation, value], axis=-1)))
 
         self.sleep([core.ButtonPressWaker(io.controller.button_menu)])
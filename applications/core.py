@@ -1,10 +1,12 @@
-import colorsys
 import hashlib
 import os.path
 import json
 import time
 import threading
 
+from IO import core
+from IO.color import hsv_to_rgb
+
 
 class Waker:
     def wake_up(self):
@@ -54,18 +56,17 @@ class Application:
 
         if color is None:
             hue = int(hashlib.md5(self.name.encode()).hexdigest(), 16) % 255
-            self.color = tuple(
-                map(lambda x: int(x * 255), colorsys.hsv_to_rgb(hue / 255, 1, 1))
-            )
+            self.color = tuple(int(c) for c in hsv_to_rgb((hue / 255, 1, 1)))
         else:
             self.color = color
 
         self.wakers = None
         self.sleep_time = 0
 
-        self.save_path = os.path.join(
-            "resources", "appdata", self.name.replace(" ", "_") + ".json"
-        )
+    @property
+    def save_path(self):
+        """The file the application data is stored in, named after the application"""
+        return os.path.join(core.APPDATA, self.name.replace(" ", "_") + ".json")
 
     def load_data(self):
         """Loads application data from disk. The filename is automatically generated based on the application name.
@@ -1,6 +1,6 @@
 from applications import core
 from helpers import textutils, bitmaputils
-import colorsys
+from IO.color import HSV_CACHE
 
 
 class Game(core.Application):
@@ -103,11 +103,7 @@ class Game(core.Application):
                 # Make color rainbow if its a new highscore
                 if self.score == self.highscore:
                     score_hue = self.pulse_progression - int(self.pulse_progression)
-                    score_color = tuple(
-                        map(
-                            lambda x: int(x * 255), colorsys.hsv_to_rgb(score_hue, 1, 1)
-                        )
-                    )
+                    score_color = HSV_CACHE.get(score_hue, 1, 1)
 
                     # If we have no last score yet, just display highscore
                     bitmaputils.apply_bitmap(
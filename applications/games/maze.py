@@ -2,6 +2,7 @@ from applications.games import core
 from applications.games.alphabeta import BitField
 from helpers import animations
 from IO.color import *
+import functools
 import random
 import time
 
@@ -36,15 +37,27 @@ class MazeUtils:
             | ~free1 & ~free2 & ~free3 & free4
         )
 
-        for x in range(1, maze.width - 1):
-            for y in range(1, maze.height - 1):
-                if one_free_neighbour & maze.get_bitmask(x, y):
-                    yield ((x, y))
+        # Only visit the set bits of the inner field, in the same order as going through all x and y
+        bits = one_free_neighbour & cls.get_inner_mask(maze.width, maze.height)
+        walls = []
+        while bits:
+            index = (bits & -bits).bit_length() - 1
+            walls.append((index % maze.width, index // maze.width))
+            bits &= bits - 1
+        walls.sort()
+        yield from walls
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def get_inner_mask(width, height):
+        """Bitmask of the field without its border"""
+        row = ((1 << (width - 2)) - 1) << 1
+        return sum(row << (y * width) for y in range(1, height - 1))
 
     @classmethod
     def bfs(cls, maze, start):
         distances = [
-            [cls.INFINITY for _ in range(maze.height)] for _ in range(maze.height)
+            [cls.INFINITY for _ in range(maze.height)] for _ in range(maze.width)
         ]
         distances[start[0]][start[1]] = 0
         queue = [(start, 0)]
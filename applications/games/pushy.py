@@ -236,7 +236,9 @@ class Pushy(core.Game):
                     io.display.update(x, y, Color(0, 0, 255))
                 elif self.field.field[fx, fy] == self.field.PORTAL:
                     io.display.update(
-                        x, y, Color.from_hsv(self.portal_hue.progression, 1, 1)
+                        x,
+                        y,
+                        Color.from_hsv(self.portal_hue.progression, 1, 1, cached=True),
                     )
 
         io.display.update(
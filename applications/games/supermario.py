@@ -311,13 +311,17 @@ class Supermario(core.Game):
             iy = int(powerup.pos[1])
             if 0 <= ix < io.display.width:
                 if 0 <= iy < io.display.height:
-                    color = Color.from_hsv(powerup.hue_animation.progression, 1, 1)
+                    color = Color.from_hsv(
+                        powerup.hue_animation.progression, 1, 1, cached=True
+                    )
                     io.display.update(ix, iy, color)
 
     def draw_mario(self, io, delta):
         iy = int(self.mario_entity.pos[1])
         if self.super:
-            super_color = Color.from_hsv(self.super_hue_animation.progression, 1, 1)
+            super_color = Color.from_hsv(
+                self.super_hue_animation.progression, 1, 1, cached=True
+            )
 
         if 0 <= iy < io.display.height:
             if self.super:
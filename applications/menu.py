@@ -77,6 +77,11 @@ class ApplicationOpener:
 
 
 class Menu(core.Application):
+    BATTERY_HALF = YELLOW * 0.5
+    BATTERY_FULL = GREEN * 0.5
+    HOUR_COLOR = (RED + 0.5 * GREEN) * 0.5
+    MINUTE_COLOR = BLUE * 0.5
+
     def __init__(self, applications, *args, speed=4, **kwargs):
         super().__init__(*args, **kwargs)
         self.applications = applications
@@ -101,10 +106,12 @@ class Menu(core.Application):
         battery = io.get_battery()
 
         if battery < 0.5:
-            battery_color = animations.blend_colors(RED, YELLOW * 0.5, battery * 2)
+            battery_color = animations.blend_colors(
+                RED, self.BATTERY_HALF, battery * 2
+            )
         else:
             battery_color = animations.blend_colors(
-                YELLOW * 0.5, GREEN * 0.5, (battery - 0.5) * 2
+                self.BATTERY_HALF, self.BATTERY_FULL, (battery - 0.5) * 2
             )
 
         for x in range(1 + round((io.display.width - 1) * battery)):
@@ -119,19 +126,17 @@ class Menu(core.Application):
         minute = f"{now.minute:06b}"
         for x in range(4):
             if hour[x] == "1":
-                io.display.update(x, io.display.height - 1, (RED + 0.5 * GREEN) * 0.5)
+                io.display.update(x, io.display.height - 1, self.HOUR_COLOR)
             else:
-                io.display.update(x, io.display.height - 1, (RED + 0.5 * GREEN) * 0.0)
+                io.display.update(x, io.display.height - 1, BLACK)
 
         for x in range(6):
             if minute[x] == "1":
                 io.display.update(
-                    io.display.width - 6 + x, io.display.height - 1, BLUE * 0.5
+                    io.display.width - 6 + x, io.display.height - 1, self.MINUTE_COLOR
                 )
             else:
-                io.display.update(
-                    io.display.width - 6 + x, io.display.height - 1, BLUE * 0.0
-                )
+                io.display.update(io.display.width - 6 + x, io.display.height - 1, BLACK)
 
         if self.chooser.prog == self.chooser.index:
             self.sleep(
@@ -63,18 +63,50 @@ class AnimatedHSVColor:
             self.h.get_value(delta, progression, beat),
             self.s.get_value(delta, progression, beat),
             self.v.get_value(delta, progression, beat),
+            cached=True,
         )
 
 
 class Content:
+    shape = None
+
+    def prepare(self, shape):
+        """Precomputes everything that depends on the size of the frame. Contents that need it call this again if
+        they get a frame of another size.
+
+        Args:
+            shape (tuple): Width and height of the frames
+        """
+        self.shape = tuple(shape)
+
     def apply(self, frame, delta, progression, beat):
         raise NotImplementedError()
 
 
+def center_of(shape):
+    return [(shape[0] // 2, shape[1] // 2)]
+
+
+def circle_of(shape, radius):
+    """Returns the pixels of a circle around the center of the frame, ordered clockwise so they can be used as a path
+
+    Args:
+        shape (tuple): Width and height of the frame
+        radius (float): Radius relative to half of the shorter side of the frame
+    """
+    cx, cy = (shape[0] - 1) / 2, (shape[1] - 1) / 2
+    r = radius * min(shape[:2]) / 2
+    coords = [
+        (x, y)
+        for x in range(shape[0])
+        for y in range(shape[1])
+        if abs(math.hypot(x - cx, y - cy) - r) < 0.5
+    ]
+    return sorted(coords, key=lambda c: math.atan2(c[0] - cx, cy - c[1]) % (2 * math.pi))
+
+
 class Drawer(Content):
     def __init__(self, color=AnimatedHSVColor(), coords=None, radius=1):
-        if coords is None:
-            coords = [(5, 7)]
         self.color = color
         self.coords = coords
         self.radius = radius
@@ -83,7 +115,8 @@ class Drawer(Content):
 
     def apply(self, frame, delta, progression, beat):
         color = self.color.get_value(delta, progression, beat)
-        for x, y in self.coords:
+        coords = center_of(frame.shape) if self.coords is None else self.coords
+        for x, y in coords:
             frame[
                 max(0, x - self.radius1) : min(frame.shape[0], x + self.radius2),
                 max(0, y - self.radius1) : min(frame.shape[1], y + self.radius2),
@@ -117,16 +150,15 @@ class Particles(Drawer):
         self, *args, path=None, particles=10, position=AnimatedValue(period=4), **kwargs
     ):
         super().__init__(*args, **kwargs)
-        if path is None:
-            path = [(5, 7)]
         self.path = path
         self.particles = particles
         self.position = position
 
     def apply(self, frame, delta, progression, beat):
         pos = self.position.get_value(delta, progression, beat)
+        path = center_of(frame.shape) if self.path is None else self.path
         self.coords = [
-            self.path[int((pos + i / self.particles) * len(self.path)) % len(self.path)]
+            path[int((pos + i / self.particles) * len(path)) % len(path)]
             for i in range(self.particles)
         ]
         return super().apply(frame, delta, progression, beat)
@@ -138,31 +170,43 @@ class Animation(Drawer):
     ):
         super().__init__(*args, **kwargs)
 
+        # Frames are kept as (height, width) images at their original size and scaled to the frame size in prepare
         if path.endswith(".npy"):
-            animation = np.load(path)
-            self.frame_coords = [
-                list(zip(*reversed(np.where(frame)))) for frame in animation
-            ]
+            self.images = [image.astype(np.uint8) * 255 for image in np.load(path)]
         elif path.endswith(".gif"):
-            self.frame_coords = []
+            self.images = []
             cap = cv2.VideoCapture(path)
             while cap.isOpened():
                 ret, frame = cap.read()
                 if ret == True:
-                    frame = cv2.resize(frame, (10, 15))
-                    self.frame_coords.append(
-                        list(zip(*reversed(np.where(frame[:, :, 0] == 255))))
-                    )
+                    self.images.append(frame)
                 else:
                     break
             cap.release()
         else:
             raise ValueError(f"Cannot load animations of type {path.split('.')[-1]}")
 
-        self.animation_length = len(self.frame_coords)
+        self.frame_coords = []
+        self.animation_length = len(self.images)
         self.driver = driver
 
+    def prepare(self, shape):
+        super().prepare(shape)
+        self.frame_coords = []
+        for image in self.images:
+            if image.shape[:2] != self.shape[::-1]:
+                interpolation = cv2.INTER_NEAREST if image.ndim == 2 else cv2.INTER_LINEAR
+                image = cv2.resize(image, self.shape, interpolation=interpolation)
+            if image.ndim == 3:
+                image = image[:, :, 0]
+            self.frame_coords.append(list(zip(*reversed(np.where(image == 255)))))
+
     def apply(self, frame, delta, progression, beat):
+        if frame.shape[:2] != self.shape:
+            self.prepare(frame.shape[:2])
+        if self.animation_length == 0:
+            # The file could not be read, e.g. the videos are not on this machine
+            return frame
         idx = int(
             self.driver.get_value(delta, progression, beat) * self.animation_length
         )
@@ -193,24 +237,31 @@ class Slideshow(Content):
                     )
                 ] = 0
 
+        self.sources = images
         self.images = []
-        for image in images:
+        self.animation_length = len(self.sources)
+        self.driver = AnimatedValue(fun1=lambda x: x, period=self.animation_length)
+        self.zoom_driver = AnimatedValue()
+
+    def prepare(self, shape):
+        super().prepare(shape)
+        frame_width, frame_height = self.shape
+        self.images = []
+        for image in self.sources:
             a = []
-            for width in range(1, 11):
-                height = int(width * 1.5)
+            for width in range(1, frame_width + 1):
+                height = int(width * frame_height / frame_width)
                 resized = cv2.resize(image, (height, width), cv2.INTER_NEAREST)
-                new_image = np.zeros(image.shape)
-                left = (10 - width) // 2
-                top = (15 - height) // 2
+                new_image = np.zeros((frame_width, frame_height, image.shape[2]))
+                left = (frame_width - width) // 2
+                top = (frame_height - height) // 2
                 new_image[left : left + width, top : top + height] = resized
                 a.append(new_image)
             self.images.append(a)
 
-        self.animation_length = len(self.images)
-        self.driver = AnimatedValue(fun1=lambda x: x, period=self.animation_length)
-        self.zoom_driver = AnimatedValue()
-
     def apply(self, frame, delta, progression, beat):
+        if frame.shape[:2] != self.shape:
+            self.prepare(frame.shape[:2])
         idx = int(
             self.driver.get_value(delta, progression, beat) * self.animation_length
         )
@@ -248,14 +299,23 @@ class ColoredVideo(Content):
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        self.path = path
+        self.draw_black = draw_black
+        self.frames = []
+        self.driver = driver
+        self.animation_length = 0
+
+    def prepare(self, shape):
+        """Decodes the video at the size of the frame, the full size video would not fit into memory"""
+        super().prepare(shape)
         frames_noalpha = []
-        cap = cv2.VideoCapture(path)
+        cap = cv2.VideoCapture(self.path)
         while cap.isOpened():
             ret, frame = cap.read()
             if ret == True:
                 frames_noalpha.append(
                     cv2.cvtColor(
-                        cv2.resize(frame, (10, 15)), cv2.COLOR_BGR2RGB
+                        cv2.resize(frame, self.shape), cv2.COLOR_BGR2RGB
                     ).swapaxes(0, 1)
                 )
             else:
@@ -263,14 +323,15 @@ class ColoredVideo(Content):
         cap.release()
 
         self.frames = [
-            np.ndarray((10, 15, 4), dtype=np.uint8) for _ in range(len(frames_noalpha))
+            np.ndarray((*self.shape, 4), dtype=np.uint8)
+            for _ in range(len(frames_noalpha))
         ]
 
         for i, frame in enumerate(frames_noalpha):
             self.frames[i][:, :, :3] = frame
             self.frames[i][:, :, 3] = 255
 
-            if not draw_black:
+            if not self.draw_black:
                 self.frames[i][
                     np.where(
                         (frame[:, :, 0] == 0)
@@ -279,10 +340,13 @@ class ColoredVideo(Content):
                     )
                 ] = 0
 
-        self.driver = driver
         self.animation_length = len(self.frames)
 
     def apply(self, frame, delta, progression, beat):
+        if frame.shape[:2] != self.shape:
+            self.prepare(frame.shape[:2])
+        if self.animation_length == 0:
+            return frame
         idx = int(
             self.driver.get_value(delta, progression, beat) * self.animation_length
         )
@@ -334,10 +398,6 @@ class GameOfLife(Drawer):
         self.period = period
         self.beat_count = 0
 
-    @staticmethod
-    def get(field, x, y):
-        return field[x % field.shape[0], y % field.shape[1]]
-
     def apply(self, frame, delta, progression, beat):
         if beat:
             self.beat_count = (self.beat_count + 1) % self.period
@@ -352,26 +412,16 @@ class GameOfLife(Drawer):
                 self.field[x][y] = True
 
         if beat:
-            next_field = np.zeros(self.field.shape)
-            for x in range(next_field.shape[0]):
-                for y in range(next_field.shape[1]):
-                    count = (
-                        0
-                        + self.get(self.field, x - 1, y - 1)
-                        + self.get(self.field, x - 1, y)
-                        + self.get(self.field, x - 1, y + 1)
-                        + self.get(self.field, x, y - 1)
-                        + self.get(self.field, x, y + 1)
-                        + self.get(self.field, x + 1, y - 1)
-                        + self.get(self.field, x + 1, y)
-                        + self.get(self.field, x + 1, y + 1)
-                    )
-                    if count == 3:
-                        next_field[x][y] = True
-                    elif count == 2:
-                        next_field[x][y] = self.field[x][y]
-                    else:
-                        next_field[x][y] = False
+            # The field wraps around at the edges
+            count = sum(
+                np.roll(self.field, (dx, dy), axis=(0, 1))
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+                if dx != 0 or dy != 0
+            )
+            next_field = ((count == 3) | ((count == 2) & (self.field != 0))).astype(
+                np.float64
+            )
             self.coords = list(zip(*np.where(next_field)))
 
             if np.all(self.field == next_field):
@@ -414,6 +464,11 @@ class Maze(Content):
             self.max2 = max(
                 [d for row in self.distances2 for d in row if d != MazeUtils.INFINITY]
             )
+            self.reached = []
+            for distances in (self.distances1, self.distances2):
+                distances = np.array(distances)
+                reached = distances != MazeUtils.INFINITY
+                self.reached.append((reached, np.where(reached, distances, 0)))
 
             center = None
             for x in range(frame.shape[0]):
@@ -457,26 +512,18 @@ class Maze(Content):
             max_distance1 = self.max1 * progression + 1
             max_distance2 = self.max2 * progression + 1
 
-            for x in range(frame.shape[0]):
-                for y in range(frame.shape[1]):
-                    if (
-                        self.distances1[x][y] != MazeUtils.INFINITY
-                        and self.distances1[x][y] < max_distance1
-                    ):
-                        frame[x][y] = bg * (self.distances1[x][y] / max_distance1)
-                    elif (
-                        self.distances2[x][y] != MazeUtils.INFINITY
-                        and self.distances2[x][y] < max_distance2
-                    ):
-                        frame[x][y] = bg * (self.distances2[x][y] / max_distance2)
+            # The second distances first, where both reach the first ones win
+            for (reached, distances), max_distance in reversed(
+                list(zip(self.reached, (max_distance1, max_distance2)))
+            ):
+                mask = reached & (distances < max_distance)
+                # Same truncation as multiplying the Color
+                frame[mask] = (
+                    np.array(bg.rgb) * (distances[mask] / max_distance)[:, None]
+                ).astype(int)
 
         else:
-            for x in range(frame.shape[0]):
-                for y in range(frame.shape[1]):
-                    if self.distances1[x][y] != MazeUtils.INFINITY:
-                        frame[x][y] = bg * (0.2)  # * self.distances1[x][y] / self.max1)
-                    if self.distances2[x][y] != MazeUtils.INFINITY:
-                        frame[x][y] = bg * (0.2)  # * self.distances2[x][y] / self.max2)
+            frame[self.reached[0][0] | self.reached[1][0]] = bg * (0.2)
             for x, y in self.path:
                 frame[x][y] = bg
 
@@ -518,23 +565,36 @@ def swirl2(w, h, x, y, f=0.7):
 
 
 class Distorter(Content):
-    def __init__(self, shape=(10, 15), speed=6, vect_fun=to_center, darken=0.1):
+    def __init__(self, shape=None, speed=6, vect_fun=to_center, darken=0.1):
         self.speed = speed
-        self.shape = shape
-
-        # Calculate weights
+        self.vect_fun = vect_fun
+        self.darken = darken
+        self.weights = []
+        if shape is not None:
+            self.prepare(shape)
+
+    def prepare(self, shape):
+        super().prepare(shape)
+        shape = self.shape
+
+        # Calculate weights, the vector functions work on whole arrays of coordinates
+        xs, ys = np.meshgrid(
+            np.arange(shape[0], dtype=np.float64),
+            np.arange(shape[1], dtype=np.float64),
+            indexing="ij",
+        )
+        vx, vy = (
+            np.broadcast_to(np.asarray(v, dtype=np.float64), shape)
+            for v in self.vect_fun(*shape, xs, ys)
+        )
+        norm = np.sqrt(vx * vx + vy * vy)
+        norm = np.where(norm > 1, norm, 1)
+        vx, vy = vx / norm, vy / norm
         weights = np.zeros(shape=(9, *shape), dtype=np.float32)
-        for x in range(shape[0]):
-            for y in range(shape[1]):
-                vector = np.array(vect_fun(*shape, x, y))
-                norm = np.linalg.norm(vector)
-                if norm > 1:
-                    vector = vector / norm
-                for i in range(-1, 2):
-                    for j in range(-1, 2):
-                        weights[(i + 1) * 3 + j, x, y] += np.linalg.norm(
-                            -vector + (i, j)
-                        )
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                dx, dy = -vx + i, -vy + j
+                weights[(i + 1) * 3 + j] += np.sqrt(dx * dx + dy * dy)
 
         # weights = np.eye(9)[np.argmin(weights, axis=0)]
 
@@ -584,12 +644,9 @@ class Distorter(Content):
                     (range_x1, range_x2, range_y1, range_y2, w.reshape(*w.shape, 1))
                 )
 
-        self.vectors = [
-            [vect_fun(*shape, x, y) for y in range(shape[1])] for x in range(shape[0])
-        ]
-        self.darken = darken
-
     def apply(self, frame, delta, progression, beat):
+        if frame.shape[:2] != self.shape:
+            self.prepare(frame.shape[:2])
         darkened = frame * (1 - self.darken)
         out = np.zeros(darkened.shape, dtype=np.float32)
 
@@ -672,11 +729,11 @@ class PortalOut(Content):
 class Milkdrop(core.Application):
     ENERGY_GRANULARITY = 10
     BEAT_MEMORY_SIZE = 4
-    SIZE = (10, 15)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.reset()
+        # The visualizations are built for the size of the display on the first update
+        self.size = None
 
     def reset(self):
         self.beat_duration = 0.5
@@ -691,59 +748,22 @@ class Milkdrop(core.Application):
             now - i * self.beat_duration for i in range(self.BEAT_MEMORY_SIZE)
         ]
 
-        center = [(self.SIZE[0] // 2, self.SIZE[1] // 2)]
+        width, height = self.size
+        center = center_of(self.size)
 
         edge = (
-            [(x, 0) for x in range(self.SIZE[0])]
-            + [(self.SIZE[0] - 1, y) for y in range(1, self.SIZE[1])]
-            + [(x, self.SIZE[1] - 1) for x in range(self.SIZE[0] - 2, 0, -1)]
-            + [(0, y) for y in range(self.SIZE[1] - 1, 0, -1)]
+            [(x, 0) for x in range(width)]
+            + [(width - 1, y) for y in range(1, height)]
+            + [(x, height - 1) for x in range(width - 2, 0, -1)]
+            + [(0, y) for y in range(height - 1, 0, -1)]
         )
 
-        circle_big = [
-            (3, 3),
-            (4, 3),
-            (5, 3),
-            (6, 3),
-            (7, 4),
-            (8, 5),
-            (9, 6),
-            (9, 7),
-            (9, 8),
-            (9, 9),
-            (8, 10),
-            (7, 11),
-            (6, 12),
-            (5, 12),
-            (4, 12),
-            (3, 12),
-            (2, 11),
-            (1, 10),
-            (0, 9),
-            (0, 8),
-            (0, 7),
-            (0, 6),
-            (1, 5),
-            (2, 4),
-        ]
-        circle_medium = [
-            (4, 5),
-            (5, 5),
-            (6, 6),
-            (7, 7),
-            (7, 8),
-            (6, 9),
-            (5, 10),
-            (4, 10),
-            (3, 9),
-            (2, 8),
-            (2, 7),
-            (3, 6),
-        ]
-        circle_small = [(4, 6), (5, 6), (6, 7), (6, 8), (5, 9), (4, 9), (3, 8), (3, 7)]
+        circle_big = circle_of(self.size, 0.9)
+        circle_medium = circle_of(self.size, 0.45)
+        circle_small = circle_of(self.size, 0.3)
 
-        all_coords = [(x, y) for x in range(self.SIZE[0]) for y in range(self.SIZE[1])]
-        shape = (*self.SIZE, 3)
+        all_coords = [(x, y) for x in range(width) for y in range(height)]
+        shape = (width, height, 3)
         self.last_frame = np.zeros(shape)
 
         frame_holder = FrameHolder()
@@ -1184,6 +1204,12 @@ class Milkdrop(core.Application):
         ]
         self.visualization_index = len(self.visualizations) - 1
 
+        # Load and scale everything now instead of when a visualization shows up
+        for visualization in self.visualizations:
+            for effect in visualization.effects:
+                if effect.shape != self.size:
+                    effect.prepare(self.size)
+
     def next_visualization(self):
         bpm = 60 / self.beat_duration
         probabilities = [
@@ -1196,7 +1222,11 @@ class Milkdrop(core.Application):
 
     def update(self, io, delta):
         now = time.time()
-        if now - self.last > 10 * delta:
+        size = (io.display.width, io.display.height)
+        if size != self.size:
+            self.size = size
+            self.reset()
+        elif now - self.last > 10 * delta:
             self.reset()
 
         if io.controller.button_up.fresh_press():
@@ -1291,8 +1321,9 @@ class Milkdrop(core.Application):
         progression = (now - self.last_beats[0]) / self.beat_duration
         viz = self.visualizations[self.visualization_index]
         self.last_frame = viz.apply(self.last_frame, delta, progression, self.beat)
-        io.display.pixels = self.last_frame.astype(np.uint8)
+        io.display.write_frame(self.last_frame)
         self.last = now
 
     def destroy(self):
-        self.reset()
+        # Rebuilt on the next update
+        self.size = None
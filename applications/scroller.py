@@ -19,7 +19,7 @@ class ScrollerEntry:
     def __eq__(self, other):
         return (
             self.text == other.text
-            and all(self.color == other.color)
+            and self.color == other.color
             and self.speed == other.speed
         )
 
@@ -84,8 +84,9 @@ class NumberChoice(core.Application):
 class BrightnessSlider(Slider):
     def update(self, io, delta):
         super().update(io, delta)
-        io.display.brightness = self.get_value()
-        io.display.force_update()
+        if io.display.brightness != self.get_value():
+            io.display.brightness = self.get_value()
+            io.display.force_update()
 
 
 class FPSChoice(NumberChoice):
@@ -185,3 +186,14 @@ class ColorPaletteChoice(core.Application):
                 left = (io.display.width - n_displayed) // 2
                 for i, x in enumerate(range(left, left + n_displayed)):
                     io.display.update(x, 12, colors[i])
+
+
+class ProfileDump(core.Application):
+    """Stores the frame timings of all applications to resources/appdata/Profile.json and closes again"""
+
+    def update(self, io, delta):
+        # main() lets every setting run for one frame before anything was opened, there is nothing to dump yet
+        if io.applications is None:
+            return
+        io.dump_profile()
+        io.close_application()
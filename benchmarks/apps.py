@@ -0,0 +1,254 @@
+"""Runs every application of the main menu headless for a fixed number of frames and reports how expensive a frame is.
+
+Usage:
+    python -m benchmarks.apps --frames 300 --out bench.json
+    python -m benchmarks.apps --compare bench.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from IO import core
+from IO.headless import HeadlessIOManager
+from IO.scheduler import FrameScheduler
+from applications.filebrowser import Filebrowser
+from applications.menu import Menu
+from applications.settings import ProfileDump
+from main import create_menu, create_settings
+
+# Applications that only trigger an action instead of rendering anything
+SKIPPED = (ProfileDump,)
+
+NAVIGATION_BUTTONS = ["button_up", "button_down"]
+GAME_BUTTONS = [
+    "button_up",
+    "button_down",
+    "button_left",
+    "button_right",
+    "button_a",
+    "button_b",
+]
+
+
+def create_benchmark_menu(video_root="resources/videos"):
+    """Creates the main menu with its settings. A fresh checkout has no videos, then the video browser starts in the
+    animations instead.
+
+    Args:
+        video_root (str, optional): The folder the video browser starts in. Defaults to "resources/videos".
+    """
+    if not os.path.isdir(video_root):
+        video_root = "resources/animations"
+    return create_menu(create_settings(), video_root=video_root)
+
+
+def iter_applications(application, path=""):
+    """Walks through the application tree, yielding the path and every application in it"""
+    path = f"{path}/{application.name}" if path else application.name
+    yield path, application
+
+    if isinstance(application, Menu):
+        children = application.applications
+    elif isinstance(application, Filebrowser):
+        children = application.menu.applications
+    else:
+        children = []
+
+    for child in children:
+        yield from iter_applications(child, path)
+
+
+def create_script(application, frames, seed=0):
+    """Creates a deterministic sequence of button presses. Menus are only scrolled, so they don't open other
+    applications, everything else gets its game started and then random inputs.
+    """
+    rng = random.Random(seed)
+    if isinstance(application, (Menu, Filebrowser)):
+        buttons = NAVIGATION_BUTTONS
+        script = []
+    else:
+        buttons = GAME_BUTTONS
+        script = [(1, "button_a", True), (2, "button_a", False)]
+
+    for frame in range(10, frames, 8):
+        button = rng.choice(buttons)
+        script += [(frame, button, True), (frame + 2, button, False)]
+    return script
+
+
+class AllocationIOManager(HeadlessIOManager):
+    """Headless IO Manager that measures how much memory is allocated on top of the frame's starting memory"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frame_memory = None
+        self.allocated = 0
+
+    def update(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.frame_memory is not None:
+            self.allocated += peak - self.frame_memory
+        tracemalloc.reset_peak()
+        self.frame_memory = current
+        super().update()
+
+
+class RealtimeIOManager(HeadlessIOManager):
+    """Headless IO Manager that paces the frames in real time instead of simulating them as fast as possible, for
+    benchmarks where threads or other processes have to keep up with the frame rate
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = FrameScheduler(policy=self.scheduler.policy)
+
+
+@contextlib.contextmanager
+def temporary_appdata():
+    """Stores the application data in a temporary directory while benchmarking, the scripted input would otherwise
+    overwrite the saved settings, highscores and paintings
+    """
+    appdata = core.APPDATA
+    with tempfile.TemporaryDirectory() as path:
+        core.APPDATA = path
+        try:
+            yield path
+        finally:
+            core.APPDATA = appdata
+
+
+def run_application(application, frames, fps, manager=HeadlessIOManager, **kwargs):
+    io = manager(
+        fps=fps, max_frames=frames, script=create_script(application, frames), **kwargs
+    )
+    with temporary_appdata():
+        try:
+            io.run(application)
+        finally:
+            application.destroy()
+    return io
+
+
+def run_realtime(application, frames, fps, **kwargs):
+    """Runs an application with scripted input for a number of frames at its real frame rate
+
+    Returns:
+        (RealtimeIOManager, float): The IO manager and the seconds the frames took
+    """
+    wall = time.perf_counter()
+    io = run_application(application, frames, fps, manager=RealtimeIOManager, **kwargs)
+    return io, time.perf_counter() - wall
+
+
+def benchmark(application, frames, fps):
+    """Benchmarks a single application
+
+    Returns:
+        dict: Frames per second, cpu time and allocated bytes per frame, peak rss of the process so far and the
+        timings of the individual frame stages
+    """
+    gc.collect()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    io = run_application(application, frames, fps)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    # Allocations are measured in a separate run, tracing slows everything down
+    tracemalloc.start()
+    try:
+        allocations = run_application(
+            application, frames, fps, manager=AllocationIOManager
+        )
+    finally:
+        tracemalloc.stop()
+
+    stages = io.profiler.get_stats()
+    return {
+        "frames": io.frames,
+        "fps": io.frames / wall,
+        "cpu_per_frame": cpu / io.frames,
+        "alloc_bytes_per_frame": allocations.allocated / allocations.frames,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "stages": {stage: stats.get("p50") for stage, stats in stages.items()},
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Prints the change in frame rate and cpu time per application compared to an older report"""
+    print(f"{'Application':<50} {'FPS':>10} {'CPU/frame':>10}")
+    for name, result in report["applications"].items():
+        base = baseline["applications"].get(name)
+        if base is None or "fps" not in base or "fps" not in result:
+            continue
+        fps = result["fps"] / base["fps"] - 1
+        cpu = result["cpu_per_frame"] / base["cpu_per_frame"] - 1
+        print(f"{name:<50} {fps:>+10.1%} {cpu:>+10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks all applications of the main menu"
+    )
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--videos", default="resources/videos")
+    parser.add_argument("--filter", default=None, help="Only run applications whose path contains this")
+    parser.add_argument("--out", default=None, help="Where to store the json report")
+    parser.add_argument("--compare", default=None, help="Older json report to compare with")
+    args = parser.parse_args()
+
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "frames": args.frames,
+        "fps": args.fps,
+        "applications": {},
+    }
+
+    root = create_benchmark_menu(args.videos)
+    for path, application in iter_applications(root):
+        if isinstance(application, SKIPPED):
+            continue
+        if args.filter is not None and args.filter not in path:
+            continue
+        try:
+            result = benchmark(application, args.frames, args.fps)
+            print(
+                f"{path:<50} {result['fps']:>8.0f} FPS {result['cpu_per_frame'] * 1000:>8.3f} ms/frame"
+            )
+        except Exception as e:
+            result = {"error": repr(e)}
+            print(f"{path:<50} failed: {e!r}")
+        report["applications"][path] = result
+
+    if args.out is not None:
+        with open(args.out, "w+") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
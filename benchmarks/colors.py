@@ -0,0 +1,104 @@
+"""Compares the cost of Color arithmetic in typical menu and game frames with the old ndarray based Color.
+
+Usage:
+    python -m benchmarks.colors --repeat 2000
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from IO.color import Color
+
+
+class NdarrayColor(np.ndarray):
+    """Color as it was before it became a slotted class: a 3 element uint8 array, where every operation runs numpy
+    on the whole array and then clamps each channel back into a new array
+    """
+
+    def __new__(cls, r, g, b):
+        return np.array([r, g, b], dtype=np.uint8).view(cls)
+
+    @staticmethod
+    def _convert(color):
+        return max(0, min(255, int(color)))
+
+    def __add__(self, other):
+        return NdarrayColor(*map(self._convert, super().__add__(other)))
+
+    def __sub__(self, other):
+        return NdarrayColor(*map(self._convert, super().__sub__(other)))
+
+    def __mul__(self, other):
+        return NdarrayColor(*map(self._convert, super().__mul__(other)))
+
+
+def to_pixel(color):
+    """What the display stores for a color"""
+    if isinstance(color, Color):
+        return color.rgb
+    return color
+
+
+def blend(cls, color1, color2, prog):
+    """Same as helpers.animations.blend_colors"""
+    return cls(*map(lambda c: c[0] * (1 - prog) + c[1] * prog, zip(color1, color2)))
+
+
+def menu_frame(cls, pixels):
+    """The color work of one frame of the main menu: battery bar, binary clock and the choice labels"""
+    red, green, blue, yellow = cls(255, 0, 0), cls(0, 255, 0), cls(0, 0, 255), cls(255, 255, 0)
+
+    battery_color = blend(cls, yellow * 0.5, green * 0.5, 0.4)
+    for x in range(10):
+        pixels[x, 0] = to_pixel(battery_color)
+    for x in range(4):
+        pixels[x, 14] = to_pixel((red + 0.5 * green) * 0.5)
+    for x in range(6):
+        pixels[4 + x, 14] = to_pixel(blue * 0.5)
+    for i in range(5):
+        color = cls(*(20 * i, 255 - 20 * i, 100)) * 0.5
+        pixels[1:9, 2 + i * 2] = to_pixel(color)
+
+
+def game_frame(cls, pixels):
+    """The color work of one frame of a block game: a playing field from a color map plus two blinkers"""
+    colors = [cls(0, 0, 0), cls(255, 0, 0), cls(0, 255, 0), cls(0, 0, 255), cls(255, 255, 0)]
+    gray, white = cls(128, 128, 128), cls(255, 255, 255)
+
+    for x in range(10):
+        for y in range(15):
+            pixels[x, y] = to_pixel(colors[(x * y) % len(colors)])
+    for prog in (0.25, 0.75):
+        blinker = gray * (1 - prog) + white * prog
+        for x in range(10):
+            pixels[x, 0] = to_pixel(blinker)
+    for i in range(32):
+        pixels[i % 10, 14] = tuple(map(lambda c: c * 0.5, colors[i % len(colors)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks Color arithmetic")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    pixels = np.zeros((10, 15, 3), dtype=np.uint8)
+    print(f"{'Workload':<12} {'ndarray':>12} {'Color':>12} {'Speedup':>8}")
+    for workload in (menu_frame, game_frame):
+        times = [
+            min(
+                timeit.repeat(
+                    lambda: workload(cls, pixels), number=args.repeat, repeat=5
+                )
+            )
+            / args.repeat
+            for cls in (NdarrayColor, Color)
+        ]
+        print(
+            f"{workload.__name__:<12} {times[0] * 1e6:>9.1f} us {times[1] * 1e6:>9.1f} us"
+            f" {times[0] / times[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
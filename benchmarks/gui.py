@@ -0,0 +1,75 @@
+"""Compares the cost of showing frames in the pygame window, drawing one rectangle per changed pixel and updating the
+whole window like before, against scaling the changed part of one small surface into the window and only updating
+that rectangle. Runs on SDL's dummy video driver, so no screen is needed.
+
+Usage:
+    python -m benchmarks.gui --frames 300 --resolution 10x15 --apps Menu Tetris "Music Visualization"
+"""
+import argparse
+import os
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+import pygame
+
+from benchmarks.apps import create_benchmark_menu, iter_applications, run_application
+from IO.gui import PygameDisplay
+from main import parse_resolution
+
+SCREEN_SIZE = (500, 750)
+
+
+class RectPygameDisplay(PygameDisplay):
+    """Draws every changed pixel as its own pixel_size square straight into the window and then updates the whole
+    window, even if only one pixel changed
+    """
+
+    def _update_frame(self, indices, colors):
+        for x, y, color in zip(*indices, colors):
+            left = self.screen_pos[0] + self.pixel_size * x
+            top = self.screen_pos[1] + self.pixel_size * y
+            pygame.draw.rect(
+                self.win,
+                color * self.brightness,
+                (left, top, self.pixel_size, self.pixel_size),
+            )
+
+    def _refresh(self):
+        pygame.display.update()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the pygame display")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--resolution", type=parse_resolution, default=(10, 15))
+    parser.add_argument(
+        "--apps", nargs="+", default=["Menu", "Tetris", "Music Visualization"]
+    )
+    args = parser.parse_args()
+
+    pygame.init()
+    win = pygame.display.set_mode(SCREEN_SIZE)
+    applications = {
+        application.name: application
+        for _, application in iter_applications(create_benchmark_menu())
+    }
+
+    print(f"{'Application':<22} {'Rectangles':>12} {'Surface':>12} {'Speedup':>8}")
+    for name in args.apps:
+        times = []
+        for display_class in (RectPygameDisplay, PygameDisplay):
+            display = display_class(win, (0, 0), SCREEN_SIZE, *args.resolution)
+            io = run_application(
+                applications[name], args.frames, args.fps, display=display
+            )
+            times.append(io.profiler.get_stats()["refresh"]["p50"])
+        print(
+            f"{name:<22} {times[0] * 1e6:>9.0f} us {times[1] * 1e6:>9.0f} us {times[0] / times[1]:>7.1f}x"
+        )
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compares showing frames on the LED strips serially after rendering with the threaded output, on strips that take
+as long to show a frame as WS281x strips. The music visualization runs in real time at the target frame rate, so it shows whether
+rendering and transmitting together still fit into the frame budget. At the end every strip is checked against the
+frame on the display. Runs on any machine, no LEDs needed.
+
+Usage:
+    python -m benchmarks.leds --frames 150 --fps 30 --sizes 10x15 20x30 32x48
+"""
+import argparse
+import time
+
+import numpy as np
+
+from applications.milkdrop import Milkdrop
+from benchmarks.apps import run_realtime
+from IO.strips import PixelMapping, SimulatedStrip, StripDisplay
+from main import parse_resolution
+
+
+def benchmark(size, threaded, args):
+    """Runs the music visualization on simulated strips
+
+    Returns:
+        dict: Frames rendered and frames shown per second, the median time the main loop spends on a frame, how
+        many frames the output dropped and whether the strips ended on the frame of the display
+    """
+    mapping = PixelMapping.single(*size, serpentine=True)
+    strips = [SimulatedStrip(length) for length in mapping.lengths]
+    display = StripDisplay(*size, strips=strips, mapping=mapping, threaded=threaded)
+    wall = time.perf_counter()
+    io, rendered = run_realtime(
+        Milkdrop(name="Music Visualization"), args.frames, args.fps, display=display
+    )
+    output = display.output
+    display.close()
+    wall = time.perf_counter() - wall
+
+    # The LEDs every strip should show for the last frame, in the layout of rpi_ws281x.Color
+    colors = display.correction.apply(display.last_pixels).astype(np.uint32)
+    packed = (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+    expected = mapping.gather(packed)
+
+    shown = strips[0].shows
+    return {
+        "rendered_fps": io.frames / rendered,
+        "shown_fps": shown / wall,
+        "frame_time": io.profiler.get_stats()["total"]["p50"],
+        "dropped": output.dropped if output is not None else 0,
+        "correct": all(
+            np.array_equal(strip.shown, leds[:, 0]) for strip, leds in zip(strips, expected)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks serial against threaded LED output"
+    )
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument(
+        "--sizes", type=parse_resolution, nargs="+", default=[(10, 15), (20, 30), (32, 48)]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'Size':<8} {'Output':<10} {'Frame time':>12} {'Rendered':>12} {'Shown':>12} {'Dropped':>8} {'Correct':>8}"
+    )
+    for size in args.sizes:
+        for threaded in (False, True):
+            result = benchmark(size, threaded, args)
+            print(
+                f"{size[0]}x{size[1]:<5} {'threaded' if threaded else 'serial':<10}"
+                f" {result['frame_time'] * 1000:>9.2f} ms {result['rendered_fps']:>8.1f} FPS"
+                f" {result['shown_fps']:>8.1f} FPS {result['dropped']:>8} {'yes' if result['correct'] else 'no':>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
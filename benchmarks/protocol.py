@@ -0,0 +1,101 @@
+"""Compares the bandwidth of the web display's binary frame protocol with the previous hex text frames, for every
+application of the main menu. Every message is decoded again and checked against the frame on the display.
+
+Usage:
+    python -m benchmarks.protocol --frames 300 --fps 30 --resolution 10x15
+"""
+import argparse
+
+from IO.headless import HeadlessIOManager
+from IO.protocol import DELTA, FrameDecoder
+from IO.web import WebDisplay
+from benchmarks.apps import (
+    SKIPPED,
+    create_benchmark_menu,
+    iter_applications,
+    run_application,
+)
+from main import parse_resolution
+
+
+class RecordingWebsocket:
+    """Stands in for the websocket server and decodes every message like a viewer would"""
+
+    def __init__(self):
+        self.decoder = FrameDecoder()
+        self.messages = 0
+        self.bytes = 0
+        self.pixels = 0
+
+    def send(self, message, snapshot=None, frame=None):
+        self.messages += 1
+        self.bytes += len(message)
+        if self.decoder.apply(message):
+            # Pixels a viewer has to redraw
+            if message[0] == DELTA:
+                self.pixels += (len(message) - 4) // 5
+            else:
+                self.pixels += self.decoder.frame.size // 3
+
+
+class WebHeadlessIOManager(HeadlessIOManager):
+    """Headless IO Manager with a web display, that checks the decoded frame after every refresh"""
+
+    def __init__(self, *args, screen_res=(10, 15), **kwargs):
+        self.websocket = RecordingWebsocket()
+        super().__init__(
+            *args, display=WebDisplay(self.websocket, *screen_res), **kwargs
+        )
+        self.display.encoder.clock = self.clock.now
+
+    def update(self):
+        decoded = self.websocket.decoder.frame
+        if decoded is None or (decoded != self.display.last_pixels).any():
+            raise AssertionError("The decoded frame differs from the display")
+        super().update()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the bandwidth of the web display"
+    )
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--resolution", type=parse_resolution, default=(10, 15))
+    args = parser.parse_args()
+
+    width, height = args.resolution
+    # The hex frames had two characters per byte and were sent every single frame
+    hex_rate = 2 * width * height * 3 * args.fps
+
+    root = create_benchmark_menu()
+    print(
+        f"{'Application':<50} {'Hex':>10} {'Binary':>10} {'Ratio':>7} {'Redrawn':>8}"
+    )
+    total_hex = total_binary = 0
+    for path, application in iter_applications(root):
+        if isinstance(application, SKIPPED):
+            continue
+        io = run_application(
+            application,
+            args.frames,
+            args.fps,
+            manager=WebHeadlessIOManager,
+            screen_res=args.resolution,
+        )
+        websocket = io.websocket
+        binary_rate = websocket.bytes / io.frames * args.fps
+        total_hex += hex_rate
+        total_binary += binary_rate
+        print(
+            f"{path[-50:]:<50} {hex_rate / 1000:>6.1f} kB/s {binary_rate / 1000:>6.1f} kB/s"
+            f" {hex_rate / max(binary_rate, 1):>6.0f}x {websocket.pixels / (io.frames * width * height):>7.0%}"
+        )
+    print(
+        f"{'Total':<50} {total_hex / 1000:>6.1f} kB/s {total_binary / 1000:>6.1f} kB/s"
+        f" {total_hex / max(total_binary, 1):>6.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
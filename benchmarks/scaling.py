@@ -0,0 +1,91 @@
+"""Measures how the frame time of the menu, a video and the music visualization grows with the size of the panel, to
+find the largest panel a machine can drive at a given frame rate. Frames are rendered headless, the time the LED strip
+needs to show a frame is not included.
+
+Usage:
+    python -m benchmarks.scaling --frames 120 --sizes 10x15 20x30 32x48 --out scaling.json
+"""
+import argparse
+import json
+import os
+import platform
+
+from applications.animations import VideoPlayer
+from applications.milkdrop import Milkdrop
+from benchmarks.apps import create_benchmark_menu, get_commit, run_application
+from main import parse_resolution
+
+WORKLOADS = {
+    "menu": lambda args: create_benchmark_menu(args.videos),
+    "video": lambda args: VideoPlayer(args.video, name="Video"),
+    "milkdrop": lambda args: Milkdrop(name="Music Visualization"),
+}
+
+
+def benchmark(workload, size, args):
+    """Runs a workload at one panel size
+
+    Returns:
+        dict: Median and 95th percentile of the frame time in seconds
+    """
+    application = WORKLOADS[workload](args)
+    io = run_application(application, args.frames, args.fps, screen_res=size)
+    total = io.profiler.get_stats()["total"]
+    return {"p50": total["p50"], "p95": total["p95"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the frame time against the panel size"
+    )
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate the panel has to reach")
+    parser.add_argument(
+        "--sizes",
+        type=parse_resolution,
+        nargs="+",
+        default=[(10, 15), (20, 30), (32, 48), (64, 96)],
+    )
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS.keys(), default=list(WORKLOADS))
+    parser.add_argument("--video", default="resources/animations/fireworks.mp4")
+    parser.add_argument("--videos", default="resources/videos", help="Folder of the video browser in the menu")
+    parser.add_argument("--out", default=None, help="Where to store the json report")
+    args = parser.parse_args()
+
+    budget = 1 / args.fps
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "frames": args.frames,
+        "fps": args.fps,
+        "results": {},
+    }
+
+    print("Median frame time")
+    print(f"{'Size':<8}" + "".join(f"{workload:>20}" for workload in args.workloads))
+    largest = {}
+    for width, height in args.sizes:
+        size = f"{width}x{height}"
+        row = f"{size:<8}"
+        for workload in args.workloads:
+            result = benchmark(workload, (width, height), args)
+            report["results"].setdefault(workload, {})[size] = result
+            row += f"{result['p50'] * 1000:>17.2f} ms"
+            if result["p95"] <= budget:
+                largest[workload] = size
+        print(row)
+
+    print(f"\nLargest panel with a 95th percentile frame time within {budget * 1000:.1f} ms ({args.fps} FPS):")
+    for workload in args.workloads:
+        print(f"{workload:<10} {largest.get(workload, 'none')}")
+    report["largest"] = largest
+
+    if args.out is not None:
+        with open(args.out, "w+") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
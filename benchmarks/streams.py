@@ -0,0 +1,106 @@
+"""Watches the music visualization through the MJPEG endpoint with many viewers at once, to check that every frame is
+only encoded once no matter how many viewers there are, that nothing is encoded without viewers and that the frame
+rate stays the same. The viewers run in a separate process.
+
+Usage:
+    python -m benchmarks.streams --viewers 0 20 --scale 10 --frames 300 --fps 30
+"""
+import argparse
+import multiprocessing
+import socket
+import time
+
+from applications.milkdrop import Milkdrop
+from benchmarks.apps import run_realtime
+from IO.web import WebDisplay, WebServer
+
+
+def watch(port, scale, duration, results):
+    """Reads the MJPEG stream for a while and reports the number of images and bytes received"""
+    sock = socket.create_connection(("localhost", port))
+    sock.sendall(
+        f"GET {WebServer.STREAM_PATH}?scale={scale} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+    )
+    sock.settimeout(0.5)
+    images = received = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        try:
+            data = sock.recv(1 << 16)
+        except socket.timeout:
+            continue
+        if not data:
+            break
+        images += data.count(b"--frame")
+        received += len(data)
+    sock.close()
+    results.put((images, received))
+
+
+def benchmark(viewers, args):
+    """Runs the music visualization in real time with a number of MJPEG viewers
+
+    Returns:
+        dict: Rendered frames per second, median frame time, how many frames changed, how many images were encoded
+        and the images and bytes every viewer received on average
+    """
+    with WebServer("localhost", args.port) as server:
+        display = WebDisplay(server, 10, 15)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=watch,
+                args=(args.port, args.scale, args.frames / args.fps, results),
+            )
+            for _ in range(viewers)
+        ]
+        for process in processes:
+            process.start()
+        while server.streams < viewers:
+            time.sleep(0.01)
+
+        start_version, start_encoded = server.images.version, server.images.encoded
+        io, wall = run_realtime(
+            Milkdrop(name="Music Visualization"), args.frames, args.fps, display=display
+        )
+        changed = server.images.version - start_version
+        encoded = server.images.encoded - start_encoded
+
+        received = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    return {
+        "fps": io.frames / wall,
+        "p50": io.profiler.get_stats()["total"]["p50"],
+        "changed": changed,
+        "encoded": encoded,
+        "images": sum(r[0] for r in received) / max(viewers, 1),
+        "bytes": sum(r[1] for r in received) / max(viewers, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the MJPEG endpoint with many viewers"
+    )
+    parser.add_argument("--viewers", type=int, nargs="+", default=[0, 20])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    print(
+        f"{'Viewers':>7} {'FPS':>6} {'Frame time':>11} {'Changed':>8} {'Encoded':>8} {'Images/viewer':>14} {'kB/viewer':>10}"
+    )
+    for viewers in args.viewers:
+        result = benchmark(viewers, args)
+        print(
+            f"{viewers:>7} {result['fps']:>6.1f} {result['p50'] * 1000:>8.2f} ms {result['changed']:>8}"
+            f" {result['encoded']:>8} {result['images']:>14.0f} {result['bytes'] / 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Load test of the web display with many viewers: the music visualization runs in real time while simulated clients
+in a separate process watch it, some of them on a slow connection. Shows whether the frame rate stays the same with
+and without viewers, how many frames the slow ones skip and how far behind they are. At the end every client checks
+that it decoded the same frame that is on the display.
+
+Usage:
+    python -m benchmarks.viewers --clients 0 50 --slow 10 --frames 300 --fps 30
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import socket
+import time
+import urllib.parse
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from applications.milkdrop import Milkdrop
+from benchmarks.apps import run_realtime
+from IO.protocol import FrameDecoder
+from IO.web import WebDisplay, WebServer
+
+DONE = "done"
+
+
+async def watch(url, slow, duration, delay):
+    """Watches the display until the server says it is done
+
+    Args:
+        url (str): The websocket url
+        slow (bool): Whether this client reads slowly through a tiny receive buffer for the first `duration` seconds
+        duration (float): How long the client stays slow
+        delay (float): Seconds a slow client waits after every message
+
+    Returns:
+        (int, str): The number of messages received and the hash of the decoded frame
+    """
+    sock = None
+    if slow:
+        address = urllib.parse.urlsplit(url)
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2048)
+        sock.connect((address.hostname, address.port))
+
+    decoder = FrameDecoder()
+    messages = 0
+    end = time.monotonic() + duration
+    async with connect(url, sock=sock, max_queue=1 if slow else 16) as websocket:
+        async for message in websocket:
+            if message == DONE:
+                break
+            decoder.apply(message)
+            messages += 1
+            if slow and time.monotonic() < end:
+                await asyncio.sleep(delay)
+    return messages, hashlib.sha1(decoder.frame.tobytes()).hexdigest()
+
+
+async def watch_all(url, clients, slow, duration, delay):
+    return await asyncio.gather(
+        *[watch(url, i < slow, duration, delay) for i in range(clients)]
+    )
+
+
+def run_clients(url, clients, slow, duration, delay, results):
+    results.put(asyncio.run(watch_all(url, clients, slow, duration, delay)))
+
+
+def benchmark(clients, args):
+    """Runs the music visualization in real time with a number of viewers
+
+    Returns:
+        dict: Rendered frames per second, median and 95th percentile frame time and the stats of the clients
+    """
+    url = f"ws://localhost:{args.port}{WebServer.WEBSOCKET_PATH}"
+    with WebServer("localhost", args.port) as websocket:
+        display = WebDisplay(websocket, 10, 15)
+        results = multiprocessing.Queue()
+        viewers = multiprocessing.Process(
+            target=run_clients,
+            args=(url, clients, args.slow, args.frames / args.fps, args.delay, results),
+        )
+        viewers.start()
+        while len(websocket.get_stats()) < clients:
+            time.sleep(0.01)
+
+        io, wall = run_realtime(
+            Milkdrop(name="Music Visualization"), args.frames, args.fps, display=display
+        )
+
+        # Let every client receive the last frame, then tell them to stop
+        while any(client["pending"] for client in websocket.get_stats()):
+            time.sleep(0.01)
+        stats = websocket.get_stats()
+        websocket.send(DONE)
+        received = results.get()
+        viewers.join()
+
+    frame = hashlib.sha1(display.last_pixels.tobytes()).hexdigest()
+    timings = io.profiler.get_stats()["total"]
+    return {
+        "fps": io.frames / wall,
+        "p50": timings["p50"],
+        "p95": timings["p95"],
+        "clients": stats,
+        "correct": sum(result[1] == frame for result in received),
+    }
+
+
+def summarize(clients):
+    """Sums up the sent, skipped and lag stats of a group of clients"""
+    if not clients:
+        return "-"
+    lag = np.percentile([client["lag"]["p95"] for client in clients], 95)
+    return (
+        f"{sum(c['sent'] for c in clients) / len(clients):>6.0f} sent"
+        f" {sum(c['dropped'] for c in clients) / len(clients):>5.0f} skipped"
+        f" {sum(c['bytes'] for c in clients) / len(clients) / 1000:>6.1f} kB"
+        f" lag p95 {lag * 1000:>6.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load tests the web display with many viewers"
+    )
+    parser.add_argument("--clients", type=int, nargs="+", default=[0, 50])
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=0.2,
+        help="Seconds a slow client waits after every message",
+    )
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        result = benchmark(clients, args)
+        print(
+            f"{clients:>3} clients: {result['fps']:>5.1f} FPS, frame time p50 {result['p50'] * 1000:.2f} ms"
+            f" p95 {result['p95'] * 1000:.2f} ms, {result['correct']}/{clients} clients ended on the displayed frame"
+        )
+        # The slowest clients connect first, but the order of the stats is not guaranteed
+        by_lag = sorted(result["clients"], key=lambda client: client["dropped"])
+        fast, slow = by_lag[: clients - args.slow], by_lag[clients - args.slow :]
+        if clients:
+            print(f"    fast: {summarize(fast)}")
+            print(f"    slow: {summarize(slow)}")
+
+
+if __name__ == "__main__":
+    main()
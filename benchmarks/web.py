@@ -0,0 +1,126 @@
+"""Measures the input to frame latency of the web display: a local client presses a button over the websocket and
+waits until it receives the frame that shows the reaction. Runs once with the main loop woken up by incoming input and
+once waiting for the next frame deadline, like before the websocket bridge woke it up.
+
+Usage:
+    python -m benchmarks.web --presses 50 --fps 30
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from applications import core as applications
+from IO import core
+from IO.protocol import FrameDecoder
+from IO.web import WebController, WebDisplay, WebServer
+
+
+class Toggle(applications.Application):
+    """Switches between black and white on every press of A, sleeps in between"""
+
+    def __init__(self):
+        super().__init__(name="Toggle")
+        self.white = False
+
+    def update(self, io, delta):
+        if io.controller.button_a.fresh_press():
+            self.white = not self.white
+        io.display.fill(core.Color(255, 255, 255) if self.white else core.Color(0, 0, 0))
+        self.sleep([applications.ButtonPressWaker(io.controller.button_a)])
+
+
+class LatencyIOManager(core.IOManager):
+    """Runs until the client is done"""
+
+    def __init__(self, websocket, *args, wake=True, **kwargs):
+        self.done = threading.Event()
+        display = WebDisplay(websocket, 10, 15)
+        super().__init__(WebController(websocket), display, *args, **kwargs)
+        if wake:
+            websocket.on_message = self.wake_up
+
+    def update(self):
+        self.controller.update()
+        if self.done.is_set():
+            self.running = False
+
+
+async def press_buttons(url, presses, seed=0):
+    """Presses A and measures how long it takes until the display turns white or black
+
+    Returns:
+        list: The latencies in seconds
+    """
+    rng = random.Random(seed)
+    decoder = FrameDecoder()
+    latencies = []
+    async with connect(url) as websocket:
+        while decoder.frame is None:
+            decoder.apply(await websocket.recv())
+        white = bool(decoder.frame[0, 0, 0])
+        for _ in range(presses):
+            # Press at a random point of the frame, not right after a frame was sent
+            await asyncio.sleep(rng.uniform(0.1, 0.2))
+            start = time.perf_counter()
+            await websocket.send("A")
+            white = not white
+            while decoder.frame is None or bool(decoder.frame[0, 0, 0]) != white:
+                decoder.apply(await websocket.recv())
+            latencies.append(time.perf_counter() - start)
+            await websocket.send("a")
+    return latencies
+
+
+def benchmark(args, wake):
+    """Runs the toggle application and a client that presses its button
+
+    Returns:
+        (list, dict): The latencies the client measured and how long inputs waited for the main loop
+    """
+    with WebServer("localhost", args.port) as websocket:
+        io = LatencyIOManager(websocket, fps=args.fps, wake=wake, profile=False)
+        result = {}
+
+        def client():
+            try:
+                result["latencies"] = asyncio.run(
+                    press_buttons(f"ws://localhost:{args.port}{WebServer.WEBSOCKET_PATH}", args.presses)
+                )
+            finally:
+                io.done.set()
+                io.wake_up()
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        io.run(Toggle())
+        thread.join()
+    return result["latencies"], io.controller.input_delay.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the input latency of the web display"
+    )
+    parser.add_argument("--presses", type=int, default=50)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"Frame period: {1000 / args.fps:.1f} ms")
+    print(f"{'Main loop':<10} {'p50':>10} {'p95':>10} {'max':>10} {'Input wait':>12}")
+    for wake in (False, True):
+        latencies, delay = benchmark(args, wake)
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(
+            f"{'woken' if wake else 'deadline':<10} {p50:>7.1f} ms {p95:>7.1f} ms {max(latencies) * 1000:>7.1f} ms"
+            f" {delay['p50'] * 1000:>9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from IO.gui import PygameIOManager
+from IO.session import SessionPlayer
+import sys
+
+if __name__ == "__main__":
+    player = SessionPlayer(sys.argv[1] if len(sys.argv) > 1 else "session.fbs")
+    if len(sys.argv) > 2:
+        player.export(sys.argv[2])
+    else:
+        with PygameIOManager(screen_res=(player.width, player.height)) as ioManager:
+            player.play(ioManager.display)
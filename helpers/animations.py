@@ -2,7 +2,7 @@
 """
 
 import numpy as np
-from IO.color import Color
+from IO.color import Color, HSV_CACHE
 
 
 def blend_colors(color1, color2, prog):
@@ -16,15 +16,15 @@ def blend_hsv_colors(color1, color2, prog):
     """If prog=0 it returns color1, if prog=1 color2, otherwise it blends linearly between in HSV space them according to the given
     prog.
     """
-    return Color.from_hsv(
-        *map(
-            lambda c: c[0] * (1 - prog) + c[1] * prog,
-            zip(color1.to_hsv(), color2.to_hsv()),
+    return Color(
+        *HSV_CACHE.get(
+            *map(
+                lambda c: c[0] * (1 - prog) + c[1] * prog,
+                zip(HSV_CACHE.get_hsv(*color1), HSV_CACHE.get_hsv(*color2)),
+            )
         )
     )
 
-    return Color(*map(lambda c: c[0] * (1 - prog) + c[1] * prog, zip(color1, color2)))
-
 
 class TimedValue:
     """A value that changes over time"""
@@ -1,9 +1,8 @@
-from IO.led import LEDIOManager
 from cv2 import INTER_NEAREST
 # from IO.gui import PygameIOManager
 # from IO.web import WebIOManager
 from IO.commandline import CursesIOManager
-from applications.settings import BrightnessSlider, FPSChoice, ChargeSlider, BatteryCapacity
+from applications.settings import BrightnessSlider, FPSChoice, ChargeSlider, BatteryCapacity, ProfileDump
 from applications.menu import Menu
 from applications.flashlight import Flashlight
 from applications.closeall import CloseAll
@@ -36,7 +35,93 @@ import traceback
 import datetime
 import os
 
+
+def create_settings():
+    """Creates the applications of the settings menu"""
+    return [
+        BrightnessSlider(start=0.1, end=1, default=1, name="Brightness"),
+        FPSChoice(default=30, name="FPS"),
+        ChargeSlider(name="Battery Charge"),
+        BatteryCapacity(default=30, name="Battery Life", step_size=1, start=0, end=100),
+        ProfileDump(name="Dump Timings"),
+        CloseAll(name="Close All", color=(255, 0, 0))
+    ]
+
+
+def create_menu(settings, video_root="resources/videos"):
+    """Creates the main menu with all applications
+
+    Args:
+        settings (list): The applications of the settings menu
+        video_root (str, optional): The folder the video browser starts in. Defaults to "resources/videos".
+    """
+    return Menu(
+        [
+            Menu(
+                [
+                    Menu(
+                        [
+                            Tetris(color=(255, 127, 0)),
+                            Snake(color=(11, 200, 93)),
+                            Flappy(color=(116, 190, 46), name="Flappy Bird"),
+                            Racer(color=(255, 0, 0)),
+                            Pong(color=(0, 0, 255)),
+                            Pacman(color=(255, 255, 0)),
+                            G2048(name="2048"),
+                            Maze(),
+                            Supermario(is_luigi=True),
+                            Menu(
+                                [
+                                    TicTacToe(name="Tic Tac Toe"),
+                                    Connect4(name="Connect 4"),
+                                    Reversi(name="Reversi"),
+                                ],
+                                name="Strategy",
+                            ),
+                            # Sudoku(),
+                            Pushy(),
+                            # Frat(name="Felder Raten"),
+                        ],
+                        name="Games",
+                    ),
+                    Milkdrop(name="Music Visualization"),
+                    Clock(),
+                    # Flashlight(name="Lampe", color=(255,255,255)),
+                    Scroller(),
+                    Filebrowser(video_root, name="Videos"),
+                    # Filebrowser(".", name="Files"),
+                    Menu(
+                        [
+                            Colors(name="Color Test"),
+                            SolidColor((255, 255, 255), name="White"),
+                            SolidColor((255, 0, 0), name="Red"),
+                            SolidColor((0, 255, 0), name="Green"),
+                            SolidColor((0, 0, 255), name="Blue"),
+                        ],
+                        name="Colors",
+                    ),
+                    Paint(),
+                ],
+                name="Apps",
+            ),
+            Menu(settings, name="Settings")
+        ]
+    )
+
+
+def parse_resolution(resolution):
+    """Parses a resolution like 10x15 into a tuple of width and height"""
+    try:
+        width, height = map(int, resolution.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Resolution {resolution} is not WIDTHxHEIGHT")
+    return width, height
+
+
 def main():
+    # The LED backend needs the hardware libraries, only import it when actually running
+    from IO.led import LEDIOManager
+
     io = {
         "led": LEDIOManager,
     }
@@ -46,80 +131,27 @@ def main():
         description="The gaming costume for Lucerne's carneval 2023 with a 10x15 screen resolution",
     )
     parser.add_argument("--io", choices=io.keys(), default="led", required=False)
+    parser.add_argument(
+        "--resolution",
+        type=parse_resolution,
+        default=(10, 15),
+        help="Width and height of the screen, e.g. 20x30 for chained panels",
+    )
     args = parser.parse_args()
 
-    settings = [
-        BrightnessSlider(start=0.1, end=1, default=1, name="Brightness"),
-        FPSChoice(default=30, name="FPS"),
-        ChargeSlider(name="Battery Charge"),
-        BatteryCapacity(default=30, name="Battery Life", step_size=1, start=0, end=100),
-        CloseAll(name="Close All", color=(255, 0, 0))
-    ]
+    settings = create_settings()
 
-    with io[args.io](record_path="out.mp4") as ioManager:
+    with io[args.io](record_path="out.mp4", screen_res=args.resolution) as ioManager:
 
         # Hack, this makes sure settings are loaded even without opening them,
         # by letting them run for 1 frame
         for setting in settings:
             setting.update(ioManager, 0)
 
-        while True:
+        while ioManager.running:
             try:
 
-                ioManager.run(
-                    Menu(
-                        [
-                            Menu(
-                                [
-                                    Menu(
-                                        [
-                                            Tetris(color=(255, 127, 0)),
-                                            Snake(color=(11, 200, 93)),
-                                            Flappy(color=(116, 190, 46), name="Flappy Bird"),
-                                            Racer(color=(255, 0, 0)),
-                                            Pong(color=(0, 0, 255)),
-                                            Pacman(color=(255, 255, 0)),
-                                            G2048(name="2048"),
-                                            Maze(),
-                                            Supermario(is_luigi=True),
-                                            Menu(
-                                                [
-                                                    TicTacToe(name="Tic Tac Toe"),
-                                                    Connect4(name="Connect 4"),
-                                                    Reversi(name="Reversi"),
-                                                ],
-                                                name="Strategy",
-                                            ),
-                                            # Sudoku(),
-                                            Pushy(),
-                                            # Frat(name="Felder Raten"),
-                                        ],
-                                        name="Games",
-                                    ),
-                                    Milkdrop(name="Music Visualization"),
-                                    Clock(),
-                                    # Flashlight(name="Lampe", color=(255,255,255)),
-                                    Scroller(),
-                                    Filebrowser("resources/videos", name="Videos"),
-                                    # Filebrowser(".", name="Files"),
-                                    Menu(
-                                        [
-                                            Colors(name="Color Test"),
-                                            SolidColor((255, 255, 255), name="White"),
-                                            SolidColor((255, 0, 0), name="Red"),
-                                            SolidColor((0, 255, 0), name="Green"),
-                                            SolidColor((0, 0, 255), name="Blue"),
-                                        ],
-                                        name="Colors",
-                                    ),
-                                    Paint(),
-                                ],
-                                name="Apps",
-                            ),
-                            Menu(settings, name="Settings")
-                        ]
-                    )
-                )
+                ioManager.run(create_menu(settings))
 
             except KeyboardInterrupt as e:
                 print("Good Bye!")